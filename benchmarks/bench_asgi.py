@@ -0,0 +1,139 @@
+# benchmarks/bench_asgi.py
+#
+# Usage: python -m benchmarks.bench_asgi [--tasks N] [--requests N] [--concurrency N]
+#        python -m benchmarks.bench_asgi --url http://127.0.0.1:8000 [--requests N] [--concurrency N]
+#
+# Fires GET /api/v1/tasks/<id> for random ids and reports requests/sec and
+# latency percentiles. Without --url both modes run in process against a
+# seeded temporary database: the Flask app on a thread pool (wsgi) and
+# project.asgi.application on one event loop (asgi). With --url the requests
+# go over HTTP to a running server, e.g. one started with either of
+#
+#     gunicorn --workers 4 --threads 8 project:app
+#     uvicorn --workers 4 project.asgi:application
+
+import argparse
+import asyncio
+import http.client
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from benchmarks.common import seed
+from project import app, cache, db
+
+# Helper functions
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def report(label, latencies, elapsed, errors):
+    print('{:<6} {:>8.0f} req/s  p50 {:>7.2f} ms  p99 {:>7.2f} ms  {} errors'.format(
+        label, len(latencies) / elapsed, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, errors))
+
+def run_threads(worker, concurrency):
+    latencies, errors = [], []
+    threads = [threading.Thread(target = worker, args = (latencies, errors)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started, len(errors)
+
+def wsgi_mode(paths, concurrency):
+    paths = iter(paths)
+    def worker(latencies, errors):
+        client = app.test_client()
+        for path in paths:
+            started = time.perf_counter()
+            if client.get(path).status_code != 200:
+                errors.append(path)
+            latencies.append(time.perf_counter() - started)
+    return run_threads(worker, concurrency)
+
+def asgi_mode(paths, concurrency):
+    from project.asgi import Application
+    application = Application(app)
+    latencies, errors = [], []
+
+    async def call(path):
+        messages = []
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def send(message):
+            messages.append(message)
+        await application({
+            'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'scheme': 'http',
+            'query_string': b'', 'headers': [], 'http_version': '1.1', 'server': ('localhost', 80)
+            }, receive, send)
+        return messages[0]['status']
+
+    async def worker(queue):
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            if await call(path) != 200:
+                errors.append(path)
+            latencies.append(time.perf_counter() - started)
+
+    async def main():
+        queue = list(paths)
+        if application.database is not None:
+            await application.database.connect()
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(queue) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+        if application.database is not None:
+            await application.database.close()
+        return elapsed
+
+    elapsed = asyncio.run(main())
+    return latencies, elapsed, len(errors)
+
+def http_mode(url, paths, concurrency):
+    target = urlparse(url)
+    paths = iter(paths)
+    def worker(latencies, errors):
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80)
+        for path in paths:
+            started = time.perf_counter()
+            connection.request('GET', target.path.rstrip('/') + path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(path)
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+    return run_threads(worker, concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'WSGI vs ASGI load test for the task endpoint')
+    parser.add_argument('--tasks', type = int, default = 10000)
+    parser.add_argument('--requests', type = int, default = 5000)
+    parser.add_argument('--concurrency', type = int, default = 32)
+    parser.add_argument('--url', help = 'base URL of a running server')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paths = ['/api/v1/tasks/{}'.format(rng.randint(1, args.tasks)) for _ in range(args.requests)]
+    if args.url:
+        report('http', *http_mode(args.url, paths, args.concurrency))
+        return
+
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    app.config.update(SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path, METRICS_ENABLED = False)
+    db.create_all()
+    seed(db.engine, users = 100, tasks = args.tasks)
+    for label, mode in [('wsgi', wsgi_mode), ('asgi', asgi_mode)]:
+        cache.clear()
+        report(label, *mode(paths, args.concurrency))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+
+# benchmarks/bench_concurrency.py
+#
+# Usage: python -m benchmarks.bench_concurrency [--profile tuned|baseline] [--threads N] [--cycles N]
+#
+# Parallel writers create, complete and delete tasks through the dashboard
+# endpoints against a temporary SQLite file. Reports write throughput and the
+# number of "database is locked" errors.
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from project import app, db, bcrypt
+from project.models import User
+
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+# Helper functions
+
+def writer(path, name, cycles, results):
+    client = app.test_client()
+    client.post('/', data = dict(name = name, password = 'mypassword'))
+    connection = sqlite3.connect(path)
+    user_id = connection.execute('SELECT user_id FROM users WHERE name = ?', (name,)).fetchone()[0]
+    writes = locked = 0
+    for _ in range(cycles):
+        try:
+            client.post('/tasks/', data = dict(name = 'Load test', due_date = '01/01/2018', priority = '1'))
+            task_id = connection.execute('SELECT max(task_id) FROM tasks WHERE user_id = ?', (user_id,)).fetchone()[0]
+            client.get('/complete/{}/'.format(task_id))
+            client.get('/delete/{}/'.format(task_id))
+            writes += 3
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+    connection.close()
+    results.append((writes, locked))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Concurrent writer benchmark')
+    parser.add_argument('--profile', choices = ('tuned', 'baseline'), default = 'tuned')
+    parser.add_argument('--threads', type = int, default = 8)
+    parser.add_argument('--cycles', type = int, default = 50, help = 'create/complete/delete cycles per thread')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    if args.profile == 'baseline':
+        app.config['SQLITE_PRAGMAS'].clear()
+        app.config['SQLITE_PRAGMAS'].update(BASELINE_PRAGMAS)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path,
+        WTF_CSRF_ENABLED = False,
+        TESTING = True
+        )
+    db.create_all()
+    password = bcrypt.generate_password_hash('mypassword', 4).decode('utf-8')
+    for i in range(args.threads):
+        db.session.add(User('writer{}'.format(i), 'writer{}@example.com'.format(i), password))
+    db.session.commit()
+    db.session.remove()
+
+    results = []
+    threads = [
+        threading.Thread(target = writer, args = (path, 'writer{}'.format(i), args.cycles, results))
+        for i in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    writes = sum(result[0] for result in results)
+    locked = sum(result[1] for result in results)
+    print('profile:      {}'.format(args.profile))
+    print('writes:       {} in {:.2f}s ({:.1f}/s)'.format(writes, elapsed, writes / elapsed))
+    print('lock errors:  {}'.format(locked))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_fragments.py
+#
+# Usage: python -m benchmarks.bench_fragments [--rows N] [--repeat N]
+#
+# Renders the dashboard with N rows in both the open and the closed table,
+# with and without the fragment cache, and reports the render time.
+
+import argparse
+import os
+import tempfile
+
+from flask import session
+
+from benchmarks.common import seed, timed
+from project import app, cache, db
+from project.tasks.forms import AddTaskForm
+from project.tasks.views import render_dashboard
+
+# Helper functions
+
+def render():
+    with app.test_request_context('/tasks/?closed_page=1'):
+        session.update(logged_in = True, user_id = 1, name = 'user1', role = 'user')
+        return render_dashboard(AddTaskForm())
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Dashboard fragment cache benchmark')
+    parser.add_argument('--rows', type = int, default = 10000, help = 'rows per table')
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path,
+        WTF_CSRF_ENABLED = False,
+        DASHBOARD_PAGE_SIZE = args.rows,
+        CACHE_THRESHOLD = max(app.config['CACHE_THRESHOLD'], 100)
+        )
+    with app.app_context():
+        db.create_all()
+        seed(db.engine, users = 100, tasks = args.rows * 2)
+
+    for caching in (False, True):
+        app.config['DASHBOARD_FRAGMENT_CACHING'] = caching
+        cache.clear()
+        render()
+        elapsed = timed(render, repeat = args.repeat)
+        print('{:<10} {:>10.2f} ms'.format('cached' if caching else 'uncached', elapsed * 1000))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
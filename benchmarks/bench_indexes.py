@@ -0,0 +1,61 @@
+
+# benchmarks/bench_indexes.py
+#
+# Usage: python -m benchmarks.bench_indexes [--tasks N] [--url DATABASE_URL]
+
+import argparse
+
+from sqlalchemy import text
+
+from benchmarks.common import create_tables, seed, temporary_engine, timed
+from db_migrate import create_indexes
+
+QUERIES = {
+    'open tasks by due date': (
+        'SELECT * FROM tasks WHERE status = :status ORDER BY due_date ASC LIMIT 50',
+        {'status': 1}
+        ),
+    'closed tasks by due date': (
+        'SELECT * FROM tasks WHERE status = :status ORDER BY due_date ASC LIMIT 50',
+        {'status': 0}
+        ),
+    'open tasks of one user': (
+        'SELECT task_id FROM tasks WHERE user_id = :user_id AND status = :status',
+        {'user_id': 42, 'status': 1}
+        )
+}
+
+# Helper functions
+
+def query_plan(connection, statement, parameters):
+    if connection.dialect.name == 'sqlite':
+        rows = connection.execute(text('EXPLAIN QUERY PLAN ' + statement), parameters)
+        return [row[-1] for row in rows]
+    rows = connection.execute(text('EXPLAIN ' + statement), parameters)
+    return [row[0] for row in rows]
+
+def report(engine, label):
+    print('== {}'.format(label))
+    with engine.connect() as connection:
+        for name, (statement, parameters) in QUERIES.items():
+            elapsed = timed(lambda: connection.execute(text(statement), parameters).fetchall())
+            print('{:<28} {:>10.2f} ms'.format(name, elapsed * 1000))
+            for line in query_plan(connection, statement, parameters):
+                print('    {}'.format(line))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Task index benchmark')
+    parser.add_argument('--tasks', type = int, default = 1000000)
+    parser.add_argument('--users', type = int, default = 1000)
+    parser.add_argument('--url', help = 'database to seed (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    engine = temporary_engine(args.url)
+    create_tables(engine, indexes = False)
+    seed(engine, users = args.users, tasks = args.tasks)
+    report(engine, 'without indexes')
+    create_indexes(engine)
+    report(engine, 'with indexes')
+
+if __name__ == '__main__':
+    main()
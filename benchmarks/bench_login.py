@@ -0,0 +1,87 @@
+
+# benchmarks/bench_login.py
+#
+# Usage: python -m benchmarks.bench_login [--threads N] [--logins N] [--rounds N] [--workers N]
+#
+# Drives concurrent logins through the app while a probe thread keeps hitting
+# a cheap API endpoint, and reports login throughput and probe latency.
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from project import app, db, bcrypt
+from project.models import User
+
+# Helper functions
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def login_worker(count, name, errors):
+    client = app.test_client()
+    for _ in range(count):
+        response = client.post('/', data = dict(name = name, password = 'mypassword'))
+        if response.status_code != 302:
+            errors.append(response.status_code)
+        client.get('/logout/')
+
+def probe_worker(stop, latencies):
+    client = app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get('/api/v1/tasks/1')
+        latencies.append(time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Login throughput benchmark')
+    parser.add_argument('--threads', type = int, default = 16)
+    parser.add_argument('--logins', type = int, default = 10, help = 'logins per thread')
+    parser.add_argument('--rounds', type = int, default = 12, help = 'bcrypt work factor')
+    parser.add_argument('--workers', type = int, default = 4, help = 'password hashing pool size')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path,
+        WTF_CSRF_ENABLED = False,
+        BCRYPT_LOG_ROUNDS = args.rounds,
+        REQUEST_THREADS = args.threads,
+        PASSWORD_HASH_WORKERS = args.workers,
+        PASSWORD_HASH_TIMEOUT = 60.0
+        )
+    db.create_all()
+    password = bcrypt.generate_password_hash('mypassword', args.rounds).decode('utf-8')
+    for i in range(args.threads):
+        db.session.add(User('user{}'.format(i), 'user{}@example.com'.format(i), password))
+    db.session.commit()
+
+    errors, latencies, stop = [], [], threading.Event()
+    probe = threading.Thread(target = probe_worker, args = (stop, latencies))
+    workers = [
+        threading.Thread(target = login_worker, args = (args.logins, 'user{}'.format(i), errors))
+        for i in range(args.threads)
+    ]
+    probe.start()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe.join()
+    os.remove(path)
+
+    total = args.threads * args.logins
+    print('logins:           {} in {:.2f}s ({:.1f}/s), {} failed'.format(total, elapsed, total / elapsed, len(errors)))
+    print('probe requests:   {}'.format(len(latencies)))
+    print('probe latency:    p50 {:.1f} ms, p99 {:.1f} ms'.format(
+        percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_serializer.py
+#
+# Usage: python -m benchmarks.bench_serializer [--tasks N] [--repeat N]
+#
+# Serializes every task to one JSON document, once through ORM instances, a
+# hand-built dict and jsonify, and once through Core tuples, the compiled
+# task schema and the fastest available encoder, and reports rows/sec.
+
+import argparse
+
+from flask import jsonify
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from benchmarks.common import create_tables, seed, temporary_engine, timed
+from project import app
+from project.models import Task
+from project.serializers import dumps, orjson, task_schema
+
+# Helper functions
+
+def jsonify_path(engine):
+    session = Session(bind = engine)
+    try:
+        items = []
+        for result in session.query(Task):
+            items.append({
+                'task_id': result.task_id,
+                'task name': result.name,
+                'due date': str(result.due_date),
+                'priority': result.priority,
+                'posted date': str(result.posted_date),
+                'status': result.status,
+                'user id': result.user_id
+                })
+        with app.test_request_context():
+            return jsonify({'items': items}).get_data()
+    finally:
+        session.close()
+
+def schema_path(engine):
+    columns = task_schema.columns(task_schema.names())
+    with engine.connect() as connection:
+        rows = connection.execute(select(columns)).fetchall()
+    return dumps({'items': task_schema.dump(rows)})
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Task serializer benchmark')
+    parser.add_argument('--tasks', type = int, default = 100000)
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    engine = temporary_engine()
+    create_tables(engine)
+    seed(engine, users = 100, tasks = args.tasks)
+
+    print('encoder: {}'.format('orjson' if orjson is not None else 'json'))
+    for name, path in [('orm + jsonify', jsonify_path), ('core + compiled schema', schema_path)]:
+        elapsed = timed(lambda: path(engine), repeat = args.repeat)
+        print('{:<24} {:>10.0f} rows/s {:>10.2f} ms'.format(name, args.tasks / elapsed, elapsed * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_startup.py
+#
+# Usage: python -m benchmarks.bench_startup [--repeat N] [--top N] [module ...]
+#
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+# summarizes the result: total import time and the slowest modules pulled in.
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Helper functions
+
+# Returns {module: cumulative microseconds} and the total for the statement,
+# which is the sum of the top-level entries
+def import_times(statement):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd = ROOT, stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True, check = True
+        )
+    times, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return times, total
+
+def best_total(statement, repeat = 3):
+    return min(import_times(statement)[1] for _ in range(repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Import time summary')
+    parser.add_argument('modules', nargs = '*', default = ['project', 'project.models', 'db_migrate'])
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--top', type = int, default = 10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        statement = 'import {}'.format(module)
+        runs = [import_times(statement) for _ in range(args.repeat)]
+        times, total = min(runs, key = lambda run: run[1])
+        print('== {} {:>10.1f} ms'.format(module, total / 1000.0))
+        for name, cumulative in sorted(times.items(), key = lambda item: -item[1])[:args.top]:
+            print('    {:<40} {:>10.1f} ms'.format(name, cumulative / 1000.0))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/bench_suite.py
+#
+# Usage: python -m benchmarks.bench_suite [--users N] [--tasks N] [--requests N] [--rounds N] [--output FILE] [--compare FILE]
+#
+# Seeds a temporary database through db_seed, drives the dashboard, the API
+# list and detail endpoints, logins and complete/delete through the test
+# client, and writes per-scenario latency percentiles and throughput as JSON.
+# Pass --compare with an earlier output to print the change per scenario.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+from sqlalchemy import select
+
+import db_seed
+from benchmarks.bench_login import percentile
+from project import cache, create_app, db
+from project.models import Task
+
+PASSWORD = 'password'
+
+# Helper functions
+
+def measure(requests, call):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        before = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(requests / elapsed, 1)
+        }
+
+def check(response, status = 200):
+    if response.status_code != status:
+        raise RuntimeError('{} {}: expected {}'.format(response.request.path, response.status_code, status))
+
+def logged_in(app, name):
+    client = app.test_client()
+    check(client.post('/', data = dict(name = name, password = PASSWORD)), 302)
+    return client
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def scenarios(app, args, user_ids):
+    rng = random.Random(args.seed)
+    client = logged_in(app, 'user{}'.format(user_ids[0]))
+    with app.app_context():
+        task_ids = [row[0] for row in db.session.execute(select([Task.task_id]).order_by(Task.task_id))]
+        owned = [row[0] for row in db.session.execute(
+            select([Task.task_id]).where(Task.user_id == user_ids[0]).where(Task.status == 1).order_by(Task.task_id))]
+    anonymous = app.test_client()
+
+    def dashboard_cold(i):
+        cache.clear()
+        check(client.get('/tasks/'))
+
+    def api_list(i):
+        check(anonymous.get('/api/v1/tasks/?limit=50&status=1&sort=due_date'))
+
+    def api_detail(i):
+        check(anonymous.get('/api/v1/tasks/{}'.format(rng.choice(task_ids))))
+
+    def login(i):
+        guest = app.test_client()
+        check(guest.post('/', data = dict(name = 'user{}'.format(rng.choice(user_ids)), password = PASSWORD)), 302)
+
+    # completes one of the user's open tasks and deletes it
+    def complete_delete(i):
+        task_id = owned[i % len(owned)]
+        check(client.get('/complete/{}/'.format(task_id)), 302)
+        check(client.get('/delete/{}/'.format(task_id)), 302)
+
+    yield 'dashboard_cold', dashboard_cold, args.requests
+    yield 'dashboard_warm', lambda i: check(client.get('/tasks/')), args.requests
+    yield 'api_list', api_list, args.requests
+    yield 'api_detail', api_detail, args.requests
+    yield 'login', login, max(args.requests // 10, 1)
+    # writes last: every one invalidates the caches the reads above rely on
+    yield 'complete_delete', complete_delete, min(args.requests, len(owned))
+
+def compare(results, path):
+    with open(path) as f:
+        baseline = json.load(f)['scenarios']
+    print('{:<16} {:>12} {:>12} {:>8}'.format('scenario', 'before p50', 'after p50', 'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['p50_ms'], result['p50_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        print('{:<16} {:>9.2f} ms {:>9.2f} ms {:>+7.1f}%'.format(name, before, after, change))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'End-to-end benchmark suite')
+    parser.add_argument('--users', type = int, default = 1000)
+    parser.add_argument('--tasks', type = int, default = 100000)
+    parser.add_argument('--requests', type = int, default = 200, help = 'requests per scenario')
+    parser.add_argument('--rounds', type = int, default = 4, help = 'bcrypt work factor')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', default = 'bench-results.json')
+    parser.add_argument('--compare', help = 'earlier output to compare against')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path,
+        'WTF_CSRF_ENABLED': False,
+        'BCRYPT_LOG_ROUNDS': args.rounds
+        })
+    with app.app_context():
+        started = time.perf_counter()
+        user_ids = db_seed.seed(db.engine, args.users, args.tasks, args.seed, PASSWORD, args.rounds)
+        seed_seconds = time.perf_counter() - started
+
+    results = {}
+    for name, call, requests in scenarios(app, args, user_ids):
+        results[name] = measure(requests, call)
+        print('{:<16} p50 {:>8.2f} ms  p95 {:>8.2f} ms  {:>8.1f} req/s'.format(
+            name, results[name]['p50_ms'], results[name]['p95_ms'], results[name]['rps']))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.utcnow().replace(microsecond = 0).isoformat() + 'Z',
+            'commit': commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'users': args.users,
+            'tasks': args.tasks,
+            'seed_seconds': round(seed_seconds, 2)
+            },
+        'scenarios': results
+        }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent = 2, sort_keys = True)
+    print('Results written to {}'.format(args.output))
+    if args.compare:
+        compare(results, args.compare)
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+
+# benchmarks/common.py
+
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+
+from project.models import Task, TaskCount, TaskDueCount, User
+
+BATCH_SIZE = 10000
+
+# Helper functions
+
+def temporary_engine(url = None):
+    if url:
+        return create_engine(url)
+    handle, path = tempfile.mkstemp(prefix = 'flasktaskr-bench-', suffix = '.db')
+    os.close(handle)
+    return create_engine('sqlite:///' + path)
+
+def create_tables(engine, indexes = True):
+    User.__table__.create(engine, checkfirst = True)
+    # the counter triggers created with tasks write to these
+    TaskCount.__table__.create(engine, checkfirst = True)
+    TaskDueCount.__table__.create(engine, checkfirst = True)
+    Task.__table__.create(engine, checkfirst = True)
+    if not indexes:
+        for index in Task.__table__.indexes:
+            index.drop(engine)
+
+def seed(engine, users = 1000, tasks = 1000000, seed = 0):
+    rng = random.Random(seed)
+    start = date(2018, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'name': 'user{}'.format(i), 'email': 'user{}@example.com'.format(i), 'password': 'x', 'role': 'user'}
+            for i in range(1, users + 1)
+            ])
+    for offset in range(0, tasks, BATCH_SIZE):
+        rows = [{
+            'name': 'Task {}'.format(i),
+            'due_date': start + timedelta(days = rng.randint(0, 730)),
+            'priority': rng.randint(1, 10),
+            'posted_date': start + timedelta(days = rng.randint(0, 365)),
+            'status': rng.randint(0, 1),
+            'user_id': rng.randint(1, users)
+            } for i in range(offset, min(offset + BATCH_SIZE, tasks))]
+        with engine.begin() as connection:
+            connection.execute(Task.__table__.insert(), rows)
+
+def timed(function, repeat = 5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
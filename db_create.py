@@ -3,9 +3,11 @@
 
 from datetime import date
 
-from project import db
+from project import create_app, db
 from project.models import Task
 
+app = create_app()
+app.app_context().push()
 
 # create the database and the db table
 db.create_all()
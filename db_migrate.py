@@ -2,10 +2,16 @@
 # db_migrate.py
 
 import sqlite3
+import sys
 from datetime import datetime
 
-from project import db
+from sqlalchemy import text
+
+from project import create_app, db
 from project._config import DATABASE_PATH
+from project.models import Task
+from project.search import install_search
+from project.stats import install_triggers, rebuild
 
 
 # with sqlite3.connect(DATABASE_PATH) as connection:
@@ -24,18 +30,78 @@ from project._config import DATABASE_PATH
 
 #     c.execute('drop table old_tasks')
 
-with sqlite3.connect(DATABASE_PATH) as connection:
-    c = connection.cursor()
-
-    c.execute('alter table users rename to old_users')
-
-    # create the database and the table
-    db.create_all()
-
-    c.execute('select name, email, password from old_users order by user_id asc')
-
-    data = [(row[0], row[1], row[2], 'user') for row in c.fetchall()]
-
-    c.executemany('insert into users(name, email, password, role) values(?, ?, ?, ?)', data)
-
-    c.execute('drop table old_users')
\ No newline at end of file
+def migrate_users_role():
+    with sqlite3.connect(DATABASE_PATH) as connection:
+        c = connection.cursor()
+
+        c.execute('alter table users rename to old_users')
+
+        # create the database and the table
+        db.create_all()
+
+        c.execute('select name, email, password from old_users order by user_id asc')
+
+        data = [(row[0], row[1], row[2], 'user') for row in c.fetchall()]
+
+        c.executemany('insert into users(name, email, password, role) values(?, ?, ?, ?)', data)
+
+        c.execute('drop table old_users')
+
+# indexes from earlier releases that a wider index under a new name replaces;
+# an index is never redefined under its old name, since IF NOT EXISTS would
+# keep the old column list
+RETIRED_INDEXES = ['ix_tasks_status_due_date', 'ix_tasks_user_id_status']
+
+def run_ddl(engine, statement):
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level = 'AUTOCOMMIT').execute(text(statement))
+    else:
+        with engine.begin() as connection:
+            connection.execute(text(statement))
+
+# build the indexes declared on the models in place, without rebuilding the
+# tables, then drop the ones they replace
+def create_indexes(engine = None):
+    engine = engine or db.engine
+    # postgres can build and drop indexes without blocking writers, outside a transaction
+    concurrently = 'CONCURRENTLY ' if engine.dialect.name == 'postgresql' else ''
+    for index in Task.__table__.indexes:
+        run_ddl(engine, 'CREATE INDEX {}IF NOT EXISTS {} ON {} ({})'.format(
+            concurrently,
+            index.name,
+            index.table.name,
+            ', '.join(column.name for column in index.columns)
+            ))
+    for name in RETIRED_INDEXES:
+        run_ddl(engine, 'DROP INDEX {}IF EXISTS {}'.format(concurrently, name))
+    # refresh the planner statistics so the new indexes get picked up
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+# install the task counter triggers and recompute the counters from scratch
+def rebuild_stats(engine = None):
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        install_triggers(connection)
+        rebuild(connection)
+
+# create the full-text index over task names and fill it from existing rows
+def create_search(engine = None):
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        install_search(connection)
+
+COMMANDS = {
+    'users': migrate_users_role,
+    'indexes': create_indexes,
+    'stats': rebuild_stats,
+    'search': create_search
+}
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'indexes'
+    if command not in COMMANDS:
+        sys.exit('Usage: python db_migrate.py [{}]'.format('|'.join(sorted(COMMANDS))))
+    with create_app().app_context():
+        COMMANDS[command]()
@@ -0,0 +1,177 @@
+# db_seed.py
+#
+# Usage: python db_seed.py [--users N] [--tasks N] [--seed N] [--password PASSWORD] [--rounds N] [--url DATABASE_URL]
+#
+# Bulk-loads users and tasks with realistic distributions. Rows are generated
+# in batches and written through the driver's executemany (COPY on
+# PostgreSQL); the secondary indexes and the per-row counter and search
+# triggers are suspended during the load and rebuilt once at the end.
+
+import argparse
+import bisect
+import csv
+import datetime
+import io
+import itertools
+import random
+import sys
+import time
+
+import bcrypt as bcrypt_module
+from sqlalchemy import create_engine, func, select, text
+
+from project import create_app, db
+from project.models import TableVersion, Task, User
+from project.search import install_search
+from project.stats import install_triggers, rebuild
+
+# Config
+
+BATCH_SIZE = 10000
+
+VERBS = ['Review', 'Write', 'Fix', 'Call', 'Plan', 'Update', 'Prepare', 'Send', 'Book', 'Clean', 'Buy', 'Check']
+NOUNS = ['report', 'invoice', 'budget', 'meeting', 'slides', 'newsletter', 'release', 'groceries', 'flights',
+    'contract', 'backlog', 'garden', 'taxes', 'dentist', 'database', 'homepage']
+QUALIFIERS = ['', '', '', 'quarterly', 'weekly', 'urgent', 'draft', 'final', 'team']
+
+# priorities 1-10, most tasks in the lower middle
+PRIORITY_WEIGHTS = [5, 10, 15, 20, 15, 12, 9, 7, 4, 3]
+
+# share of admins among generated users
+ADMIN_SHARE = 0.01
+
+TASK_COLUMNS = ('name', 'due_date', 'priority', 'posted_date', 'status', 'user_id')
+
+# Helper functions
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+# A few users own most of the tasks: user weights follow a Zipf-like curve
+def user_picker(rng, user_ids):
+    weights = cumulative(1.0 / (rank + 1) ** 0.8 for rank in range(len(user_ids)))
+    total = weights[-1]
+    return lambda: user_ids[bisect.bisect_left(weights, rng.random() * total)]
+
+def generate_users(rng, count, start, password_hash):
+    for user_id in range(start, start + count):
+        yield {
+            'user_id': user_id,
+            'name': 'user{}'.format(user_id),
+            'email': 'user{}@example.com'.format(user_id),
+            'password': password_hash,
+            'role': 'admin' if rng.random() < ADMIN_SHARE else 'user'
+        }
+
+# Tasks are posted over the two years before today and fall due a few days to
+# a few months later; the older the due date, the likelier the task is done.
+# Rows are tuples in TASK_COLUMNS order with ISO dates, ready for the driver
+def generate_tasks(rng, count, user_ids, today = None):
+    today = today or datetime.date.today()
+    pick_user = user_picker(rng, user_ids)
+    priorities = cumulative(PRIORITY_WEIGHTS)
+    names = [' '.join(word for word in words if word) for words in itertools.product(VERBS, QUALIFIERS, NOUNS)]
+    days = [(today - datetime.timedelta(days = offset)).isoformat() for offset in range(-366, 731)]
+    for _ in range(count):
+        posted = int(rng.triangular(0, 730, 0))
+        due = posted - min(int(rng.expovariate(1 / 14.0)), 365)
+        done = 0.9 if due > 30 else 0.6 if due > 0 else 0.1
+        yield (
+            rng.choice(names),
+            days[due + 366],
+            bisect.bisect_left(priorities, rng.random() * priorities[-1]) + 1,
+            days[posted + 366],
+            0 if rng.random() < done else 1,
+            pick_user()
+        )
+
+def batches(rows, size = BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def insert_tasks(connection, batch):
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY tasks ({}) FROM STDIN WITH CSV'.format(', '.join(TASK_COLUMNS)), buffer)
+    else:
+        connection.exec_driver_sql('INSERT INTO tasks ({}) VALUES ({})'.format(
+            ', '.join(TASK_COLUMNS), ', '.join('?' * len(TASK_COLUMNS))), batch)
+
+# Maintaining six indexes and the per-row triggers costs more than the insert
+# itself; they are dropped or disabled for the load and rebuilt in one pass
+def suspend_triggers(connection):
+    for index in Task.__table__.indexes:
+        index.drop(connection)
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('ALTER TABLE tasks DISABLE TRIGGER tasks_stats'))
+    else:
+        connection.execute(text('DROP TRIGGER IF EXISTS tasks_stats_insert'))
+        connection.execute(text('DROP TRIGGER IF EXISTS tasks_search_insert'))
+
+def restore_triggers(connection):
+    for index in Task.__table__.indexes:
+        index.create(connection)
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('ALTER TABLE tasks ENABLE TRIGGER tasks_stats'))
+    install_triggers(connection)
+    rebuild(connection)
+    install_search(connection)
+
+# Users are loaded with explicit ids, so PostgreSQL's sequence has to be moved
+# past them or the next registration would collide with a seeded user
+def reset_sequences(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "SELECT setval(pg_get_serial_sequence('users', 'user_id'), (SELECT max(user_id) FROM users))"))
+
+def touch_tasks(connection):
+    connection.execute(TableVersion.bump(connection.dialect.name, 'tasks', datetime.datetime.utcnow()))
+
+def seed(engine, users = 1000, tasks = 100000, seed = 0, password = 'password', rounds = 4, today = None):
+    rng = random.Random(seed)
+    password_hash = bcrypt_module.hashpw(password.encode('utf-8'), bcrypt_module.gensalt(rounds)).decode('utf-8')
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        start = (connection.execute(select([func.max(User.user_id)])).scalar() or 0) + 1
+        for batch in batches(generate_users(rng, users, start, password_hash)):
+            connection.execute(User.__table__.insert(), batch)
+        reset_sequences(connection)
+    user_ids = list(range(start, start + users))
+    with engine.begin() as connection:
+        suspend_triggers(connection)
+        for batch in batches(generate_tasks(rng, tasks, user_ids, today)):
+            insert_tasks(connection, batch)
+        restore_triggers(connection)
+        touch_tasks(connection)
+    return user_ids
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Bulk-load realistic users and tasks')
+    parser.add_argument('--users', type = int, default = 1000)
+    parser.add_argument('--tasks', type = int, default = 100000)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--password', default = 'password', help = 'password shared by the generated users')
+    parser.add_argument('--rounds', type = int, default = 4, help = 'bcrypt work factor of the shared hash')
+    parser.add_argument('--url', help = 'database to load (defaults to the app database)')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.url:
+        engine = create_engine(args.url)
+        seed(engine, args.users, args.tasks, args.seed, args.password, args.rounds)
+    else:
+        with create_app().app_context():
+            seed(db.engine, args.users, args.tasks, args.seed, args.password, args.rounds)
+    elapsed = time.perf_counter() - started
+    print('Loaded {} users and {} tasks in {:.1f}s ({:.0f} tasks/s)'.format(
+        args.users, args.tasks, elapsed, args.tasks / elapsed if elapsed else 0))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
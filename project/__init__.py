@@ -2,42 +2,94 @@
 # project/__init__.py
 
 import datetime
-from flask import Flask, render_template, request
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from flask import Flask, current_app, render_template, request
 
-# Config
+from project.cache import Cache
+from project.database import SQLAlchemy
+from project.logs import ErrorLog
+from project.metrics import Metrics
+from project.sessions import ServerSideSessions
+from project.users.passwords import PasswordHasher
 
-app = Flask(__name__)
-app.config.from_pyfile('_config.py')
-bcrypt = Bcrypt(app)
-db = SQLAlchemy(app)
+# Extensions
 
-from project.users.views import users_blueprint
-from project.tasks.views  import tasks_blueprint
-from project.api.views  import api_blueprint
+# Created unbound and set up for each app in create_app; each keeps its
+# per-app state in app.extensions, so several apps can live side by side.
+# Bcrypt and the blueprints (WTForms, bcrypt's C bindings, the views) are only
+# imported there, so scripts and tests that just need db or the models start
+# fast.
+db = SQLAlchemy()
+cache = Cache()
+metrics = Metrics()
+error_log = ErrorLog()
+sessions = ServerSideSessions()
+passwords = PasswordHasher()
 
-app.register_blueprint(users_blueprint)
-app.register_blueprint(tasks_blueprint)
-app.register_blueprint(api_blueprint)
+_app = None
+_bcrypt = None
+
+# Helper functions
+
+def get_bcrypt():
+    global _bcrypt
+    if _bcrypt is None:
+        from flask_bcrypt import Bcrypt
+        _bcrypt = Bcrypt()
+    return _bcrypt
 
-@app.errorhandler(404)
 def not_found(error):
-    if app.debug is not True:
-        now = datetime.datetime.now()
-        url = request.url
-        with open('error.log', 'a') as f:
-            current_timestamp = now.strftime('%d-%m-%Y %H:%M:%S')
-            f.write('\n404 error at {}: {}'.format(current_timestamp, url))
+    if current_app.debug is not True:
+        error_log.error(404, datetime.datetime.now(), request.url)
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
-    if app.debug is not True:
-        now = datetime.datetime.now()
-        url = request.url
-        with open('error.log', 'a') as f:
-            current_timestamp = now.strftime('%d-%m-%Y %H:%M:%S')
-            f.write('\n500 error at {}: {}'.format(current_timestamp, url))
-    return render_template('500.html'), 500
\ No newline at end of file
+    if current_app.debug is not True:
+        error_log.error(500, datetime.datetime.now(), request.url)
+    return render_template('500.html'), 500
+
+# Application factory
+
+def create_app(config = None):
+    app = Flask(__name__)
+    app.config.from_pyfile('_config.py')
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    bcrypt = get_bcrypt()
+    bcrypt.init_app(app)
+    passwords.init_app(app, bcrypt)
+    db.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
+    error_log.init_app(app)
+    sessions.init_app(app)
+
+    from project.users.views import users_blueprint
+    from project.tasks.views import tasks_blueprint
+    from project.api.views import api_blueprint
+    # register the counter and full-text triggers on the tasks table
+    from project import search, stats
+
+    app.register_blueprint(users_blueprint)
+    app.register_blueprint(tasks_blueprint)
+    app.register_blueprint(api_blueprint)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(500, internal_error)
+    return app
+
+# project.app and project.bcrypt are built on first access. The default app
+# is also bound to db, so code written against the old module-level app keeps
+# working outside an application context.
+def __getattr__(name):
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+            db.app = _app
+        return _app
+    if name == 'bcrypt':
+        return get_bcrypt()
+    raise AttributeError("module 'project' has no attribute '{}'".format(name))
@@ -13,4 +13,92 @@ DEBUG = False
 DATABASE_PATH = os.path.join(basedir, DATABASE)
 
 SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + DATABASE_PATH)
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool for server databases (Postgres); SQLite keeps one connection
+# per checkout
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+DATABASE_POOL_TIMEOUT = 10
+DATABASE_POOL_RECYCLE = 1800
+DATABASE_POOL_PRE_PING = True
+
+# Read replicas for the read-only views (comma separated URIs in
+# DATABASE_REPLICA_URLS), picked round_robin or least_loaded. After a write the
+# user reads from the primary for DATABASE_REPLICA_STICKY_SECONDS.
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+DATABASE_REPLICA_SELECTION = os.environ.get('DATABASE_REPLICA_SELECTION', 'round_robin')
+DATABASE_REPLICA_STICKY_SECONDS = 5
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer and busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY'
+}
+
+# Loading strategy for task posters on the dashboard: joined, selectin, subquery or lazy
+TASKS_POSTER_LOADING = os.environ.get('TASKS_POSTER_LOADING', 'joined')
+
+# Number of tasks per page in each section of the dashboard
+DASHBOARD_PAGE_SIZE = 25
+
+# Cache the rendered open/closed task tables until the next task write
+DASHBOARD_FRAGMENT_CACHING = True
+
+# Default and maximum number of tasks per page on the API
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+
+# Rows fetched per round trip by the streaming export
+API_EXPORT_BATCH_SIZE = 1000
+
+# Cache for API task lookups and pages: lru (per process), file (shared by
+# the workers on a host through CACHE_DIR) or null. Writes evict the tasks
+# they change from the cache of the process that made them, so lru is only
+# for single-process servers; serve.py picks file when it runs more workers.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_THRESHOLD = 1000
+CACHE_DIR = os.path.join(basedir, 'cache')
+# sets between prunes of CACHE_DIR, per worker
+CACHE_PRUNE_INTERVAL = 100
+
+# Per-endpoint request, SQL and template timings, served on /metrics
+METRICS_ENABLED = True
+
+# 404/500 log, written in batches from a background thread. Records beyond
+# the queue size are dropped and counted rather than slowing requests down.
+ERROR_LOG_PATH = 'error.log'
+ERROR_LOG_QUEUE_SIZE = 10000
+ERROR_LOG_BATCH_SIZE = 500
+ERROR_LOG_FLUSH_INTERVAL = 1.0
+ERROR_LOG_MAX_BYTES = 10 * 1024 * 1024
+ERROR_LOG_BACKUP_COUNT = 5
+
+# bcrypt work factor; existing hashes are upgraded on the next login
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+
+# Request threads per worker process, set by serve.py from its --threads
+REQUEST_THREADS = int(os.environ.get('WEB_THREADS', 8))
+
+# Password hashing runs on a bounded pool of PASSWORD_HASH_WORKERS threads.
+# At most PASSWORD_HASH_THREAD_SHARE of the request threads (at least one) may
+# wait on it; anyone else is asked to retry after PASSWORD_HASH_TIMEOUT
+# seconds, so a login burst cannot hold every request thread.
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_THREAD_SHARE = 0.5
+PASSWORD_HASH_TIMEOUT = 0.05
+
+# Server-side sessions: None keeps the signed cookie, memory or sqlite keep
+# the data in a store and only put a random id in the cookie
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND')
+SESSION_SQLITE_PATH = os.path.join(basedir, 'sessions.db')
+SESSION_SWEEP_INTERVAL = 300
+
+# Maximum number of tasks or ids accepted by a single bulk request
+API_MAX_BULK_SIZE = 10000
\ No newline at end of file
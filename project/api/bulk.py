@@ -0,0 +1,109 @@
+
+# project/api/bulk.py
+
+import datetime
+
+from project import db
+from project.models import Task
+from project.tasks.queries import forget_tasks, touch_tasks
+
+# Config
+
+# keep multi-row INSERTs and IN (...) lists under SQLite's bound parameter
+# limit (999 before SQLite 3.32)
+INSERT_CHUNK_SIZE = 100
+ID_CHUNK_SIZE = 500
+
+# Helper functions
+
+def validate_task(item):
+    if not isinstance(item, dict):
+        raise ValueError('Task must be an object')
+    name = item.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('name is required')
+    try:
+        due_date = datetime.datetime.strptime(item.get('due_date') or '', '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('due_date must be YYYY-MM-DD')
+    priority = item.get('priority')
+    if isinstance(priority, bool) or not isinstance(priority, int) or not 1 <= priority <= 10:
+        raise ValueError('priority must be an integer between 1 and 10')
+    return name, due_date, priority
+
+def chunks(items, size):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+# Inserts one chunk and returns the new ids in row order: RETURNING where the
+# database has it, otherwise the rowid range ending at lastrowid, which is
+# contiguous because SQLite holds the write lock for the whole statement
+def insert_chunk(rows):
+    statement = Task.__table__.insert().values(rows)
+    if db.session.get_bind(Task.__mapper__, statement).dialect.name == 'postgresql':
+        return [row[0] for row in db.session.execute(statement.returning(Task.__table__.c.task_id))]
+    last = db.session.execute(statement).lastrowid
+    return list(range(last - len(rows) + 1, last + 1))
+
+def create_tasks(items, user_id):
+    results = []
+    rows = []
+    posted_date = datetime.datetime.utcnow()
+    for index, item in enumerate(items):
+        try:
+            name, due_date, priority = validate_task(item)
+        except ValueError as error:
+            results.append({'index': index, 'status': 'invalid', 'error': str(error)})
+            continue
+        rows.append({
+            'name': name,
+            'due_date': due_date,
+            'priority': priority,
+            'posted_date': posted_date,
+            'status': 1,
+            'user_id': user_id
+            })
+        results.append({'index': index, 'status': 'created'})
+    task_ids = []
+    for chunk in chunks(rows, INSERT_CHUNK_SIZE):
+        task_ids.extend(insert_chunk(chunk))
+    if rows:
+        touch_tasks()
+    db.session.commit()
+    created = iter(task_ids)
+    for result in results:
+        if result['status'] == 'created':
+            result['task_id'] = next(created)
+    return results
+
+# Completes or deletes every task in ``task_ids`` the user is allowed to touch,
+# with one SELECT per chunk of ids to classify them and one set-based statement
+# per chunk to apply
+def change_tasks(task_ids, action, user_id, is_admin):
+    owners = {}
+    for chunk in chunks(list(set(task_ids)), ID_CHUNK_SIZE):
+        owners.update(db.session.query(Task.task_id, Task.user_id).filter(Task.task_id.in_(chunk)).all())
+    allowed = [task_id for task_id in owners if is_admin or owners[task_id] == user_id]
+    for chunk in chunks(allowed, ID_CHUNK_SIZE):
+        query = db.session.query(Task).filter(Task.task_id.in_(chunk))
+        if not is_admin:
+            query = query.filter(Task.user_id == user_id)
+        if action == 'complete':
+            query.update({'status': 0}, synchronize_session = False)
+        else:
+            query.delete(synchronize_session = False)
+    if allowed:
+        touch_tasks()
+    db.session.commit()
+    forget_tasks(allowed)
+    done = 'completed' if action == 'complete' else 'deleted'
+    results = []
+    for task_id in task_ids:
+        if task_id not in owners:
+            status = 'not_found'
+        elif task_id in allowed:
+            status = done
+        else:
+            status = 'forbidden'
+        results.append({'task_id': task_id, 'status': status})
+    return results
@@ -0,0 +1,67 @@
+
+# project/api/fields.py
+
+from flask import Response, request
+
+from project.serializers import dumps, task_schema
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Config
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Helper functions
+
+def fields_arg():
+    return parse_fields(request.args.get('fields'))
+
+def parse_fields(value):
+    if not value:
+        return task_schema.names()
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in task_schema.fields]
+    if unknown or not names:
+        raise ValueError('Invalid fields: {}; expected some of {}'.format(', '.join(unknown), ', '.join(task_schema.fields)))
+    return task_schema.names(names)
+
+def trim_item(item, fields):
+    return dict((key, item[key]) for key in task_schema.keys(fields))
+
+# ?format=columnar sends one array per field instead of one object per task,
+# so keys are not repeated on every row
+def columnar(page, fields):
+    keys = task_schema.keys(fields)
+    compact = dict((key, value) for key, value in page.items() if key != 'items')
+    compact['fields'] = keys
+    compact['columns'] = [[item[key] for item in page['items']] for key in keys]
+    return compact
+
+def response_mimetype():
+    offered = [JSON_MIMETYPE]
+    if msgpack is not None:
+        offered.append(MSGPACK_MIMETYPE)
+    return request.accept_mimetypes.best_match(offered, JSON_MIMETYPE)
+
+def encoding_arg():
+    encoding = request.args.get('format', 'objects')
+    if encoding not in ('objects', 'columnar'):
+        raise ValueError('Invalid format: {}; expected objects or columnar'.format(encoding))
+    return encoding
+
+def json_response(data, status = 200):
+    return Response(dumps(data), status = status, mimetype = JSON_MIMETYPE)
+
+def encode_page(page, fields, encoding, mimetype):
+    if encoding == 'columnar':
+        page = columnar(page, fields)
+    if mimetype == MSGPACK_MIMETYPE:
+        response = Response(msgpack.packb(page, use_bin_type = True), mimetype = MSGPACK_MIMETYPE)
+    else:
+        response = json_response(page)
+    response.vary.add('Accept')
+    return response
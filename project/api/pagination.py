@@ -0,0 +1,91 @@
+
+# project/api/pagination.py
+
+import base64
+import datetime
+import json
+
+from sqlalchemy import and_, or_
+
+from project.models import Task
+
+# Config
+
+SORT_COLUMNS = {
+    'due_date': Task.due_date,
+    'posted_date': Task.posted_date,
+    'priority': Task.priority,
+    'task_id': Task.task_id
+}
+
+# Helper functions
+
+def encode_value(value):
+    return str(value) if isinstance(value, datetime.date) else value
+
+def decode_value(sort, value):
+    if sort in ('due_date', 'posted_date'):
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    return int(value)
+
+def encode_cursor(task, direction, sort = 'due_date'):
+    payload = json.dumps([direction, sort, encode_value(getattr(task, sort)), task.task_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+# Cursors are only valid for the sort order they were issued for; cursors
+# from before sorting was configurable carry no sort and mean due_date
+def decode_cursor(cursor, sort = 'due_date'):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if not isinstance(payload, list):
+            raise ValueError
+        if len(payload) == 3:
+            payload.insert(1, 'due_date')
+        direction, cursor_sort, value, task_id = payload
+        if cursor_sort != sort:
+            raise ValueError
+        value = decode_value(sort, value)
+        task_id = int(task_id)
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if direction not in ('next', 'prev'):
+        raise ValueError('Invalid cursor')
+    return direction, value, task_id
+
+def seek(column, value, task_id, forward):
+    if column is Task.task_id:
+        return Task.task_id > task_id if forward else Task.task_id < task_id
+    if forward:
+        return or_(column > value, and_(column == value, Task.task_id > task_id))
+    return or_(column < value, and_(column == value, Task.task_id < task_id))
+
+def ordering(column, forward):
+    columns = [column] if column is Task.task_id else [column, Task.task_id]
+    return [c.asc() if forward else c.desc() for c in columns]
+
+# Pages are ordered by (sort key, task_id) and located with a seek on that key,
+# so every page costs the same index range scan however deep it is
+def keyset_page(query, cursor, limit, sort = 'due_date', descending = False):
+    column = SORT_COLUMNS[sort]
+    if cursor is None:
+        direction = 'next'
+    else:
+        direction, value, task_id = decode_cursor(cursor, sort)
+        query = query.filter(seek(column, value, task_id, (direction == 'next') != descending))
+    query = query.order_by(*ordering(column, (direction == 'next') != descending))
+
+    tasks = query.limit(limit + 1).all()
+    has_more = len(tasks) > limit
+    tasks = tasks[:limit]
+    if direction == 'prev':
+        tasks.reverse()
+
+    if not tasks:
+        return tasks, None, None
+    if direction == 'next':
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        has_next, has_prev = True, has_more
+    next_cursor = encode_cursor(tasks[-1], 'next', sort) if has_next else None
+    prev_cursor = encode_cursor(tasks[0], 'prev', sort) if has_prev else None
+    return tasks, next_cursor, prev_cursor
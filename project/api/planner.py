@@ -0,0 +1,64 @@
+
+# project/api/planner.py
+
+from project.models import Task
+from .pagination import SORT_COLUMNS
+
+# Config
+
+# query argument -> (column, operator)
+FILTERS = {
+    'status': ('status', '=='),
+    'user_id': ('user_id', '=='),
+    'priority_min': ('priority', '>='),
+    'priority_max': ('priority', '<='),
+    'due_from': ('due_date', '>='),
+    'due_to': ('due_date', '<='),
+    'posted_from': ('posted_date', '>='),
+    'posted_to': ('posted_date', '<=')
+}
+
+# Helper functions
+
+def candidate_indexes():
+    indexes = [(index.name, [column.name for column in index.columns]) for index in Task.__table__.indexes]
+    indexes.append(('primary key', ['task_id']))
+    return sorted(indexes)
+
+# An index can serve a request when every equality filter is one of its
+# leading columns and the column right after them is the sort key, which is
+# also the only column allowed a range. The scan then starts at the seek
+# position and stops after one page, whatever the table size.
+def serves(columns, equal, ranges, sort):
+    prefix = columns[:len(equal)]
+    if set(prefix) != equal or len(columns) <= len(equal):
+        return False
+    return columns[len(equal)] == sort and ranges <= set([sort])
+
+def plan(filters, sort):
+    equal = set(FILTERS[name][0] for name in filters if FILTERS[name][1] == '==')
+    ranges = set(FILTERS[name][0] for name in filters if FILTERS[name][1] != '==')
+    for name, columns in candidate_indexes():
+        if serves(columns, equal, ranges, sort):
+            return name
+    raise ValueError('No index serves {} sorted by {}; this request would need a full scan'.format(
+        ', '.join(sorted(filters)) or 'an unfiltered listing', sort))
+
+def apply_filters(query, filters):
+    for name, value in filters.items():
+        column, operator = FILTERS[name]
+        column = getattr(Task, column)
+        if operator == '==':
+            query = query.filter(column == value)
+        elif operator == '>=':
+            query = query.filter(column >= value)
+        else:
+            query = query.filter(column <= value)
+    return query
+
+def sort_arg(value):
+    value = value or 'due_date'
+    sort, descending = value.lstrip('-'), value.startswith('-')
+    if sort not in SORT_COLUMNS:
+        raise ValueError('Invalid sort: {}; expected one of {}'.format(value, ', '.join(sorted(SORT_COLUMNS))))
+    return sort, descending
@@ -1,11 +1,22 @@
 
 # project/api/views.py
 
+import datetime
 from functools import wraps
-from flask import flash, redirect, jsonify, session, url_for, Blueprint, make_response
+from flask import current_app, flash, redirect, jsonify, request, session, url_for, Blueprint, make_response, Response, stream_with_context
 
-from project import db
+from project import db, cache
 from project.models import Task
+from project.conditional import add_validators, not_modified
+from project.database import read_only
+from project.stats import GLOBAL_USER_ID, summary
+from project.tasks.queries import task_key, tasks_version
+from .bulk import create_tasks, change_tasks
+from project.search import ranked_task_ids
+from project.serializers import dumps, task_schema
+from .fields import encode_page, encoding_arg, fields_arg, json_response, response_mimetype, trim_item
+from .pagination import keyset_page
+from .planner import FILTERS, apply_filters, plan, sort_arg
 
 # Config
 
@@ -23,47 +34,242 @@ def login_required(test):
             return redirect(url_for('users.login'))
     return wrap
 
+def api_login_required(test):
+    @wraps(test)
+    def wrap(*args, **kwargs):
+        if 'logged_in' in session:
+            return test(*args, **kwargs)
+        else:
+            return make_response(jsonify({"error": "You need to log in first."}), 401)
+    return wrap
+
 def open_tasks():
     return db.session.query(Task).filter_by(status = '1').order_by(Task.due_date.asc())
 
 def closed_tasks():
     return db.session.query(Task).filter_by(status = '0').order_by(Task.due_date.asc())
 
+def page_size():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type = int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+def int_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('Invalid integer for {}'.format(name))
+
+def date_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid date for {}'.format(name))
+
+def export_query():
+    query = db.session.query(*task_schema.columns(task_schema.names()))
+    status, user_id = int_arg('status'), int_arg('user_id')
+    due_from, due_to = date_arg('due_from'), date_arg('due_to')
+    if status is not None:
+        query = query.filter(Task.status == status)
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    if due_from is not None:
+        query = query.filter(Task.due_date >= due_from)
+    if due_to is not None:
+        query = query.filter(Task.due_date <= due_to)
+    return query.order_by(Task.task_id.asc())
+
+def bulk_payload(key):
+    payload = request.get_json(silent = True)
+    items = payload.get(key) if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON object with a "{}" array'.format(key))
+    if len(items) > current_app.config['API_MAX_BULK_SIZE']:
+        raise ValueError('At most {} items per request'.format(current_app.config['API_MAX_BULK_SIZE']))
+    return items
+
+def bulk_ids():
+    ids = bulk_payload('ids')
+    if not all(isinstance(task_id, int) and not isinstance(task_id, bool) for task_id in ids):
+        raise ValueError('ids must be integers')
+    return ids
+
+# Parses the filter and sort arguments and checks an index can serve them
+def list_query():
+    filters = {}
+    for name in FILTERS:
+        value = date_arg(name) if name.startswith(('due', 'posted')) else int_arg(name)
+        if value is not None:
+            filters[name] = value
+    sort, descending = sort_arg(request.args.get('sort'))
+    plan(filters, sort)
+    return filters, sort, descending
+
+# Only the requested columns are selected, plus the sort key and task_id
+# that keyset paging needs
+def tasks_page(cursor, limit, fields, filters = {}, sort = 'due_date', descending = False):
+    selected = task_schema.names(fields, sort, 'task_id')
+    query = apply_filters(db.session.query(*task_schema.columns(selected)), filters)
+    results, next_cursor, prev_cursor = keyset_page(query, cursor, limit, sort, descending)
+    json_results = task_schema.dump(results, fields, selected)
+    return {'items': json_results, 'next': next_cursor, 'prev': prev_cursor}
+
+def search_page(q, page, limit):
+    ids = ranked_task_ids(q, limit + 1, (page - 1) * limit)
+    has_next, ids = len(ids) > limit, ids[:limit]
+    rows = {}
+    if ids:
+        query = db.session.query(*task_schema.columns(task_schema.names())).filter(Task.task_id.in_(ids))
+        rows = dict((row.task_id, row) for row in query)
+    json_results = task_schema.dump([rows[task_id] for task_id in ids if task_id in rows])
+    return {
+        'items': json_results,
+        'page': page,
+        'next': page + 1 if has_next else None,
+        'prev': page - 1 if page > 1 else None
+        }
+
+def task_data(task_id):
+    result = db.session.query(*task_schema.columns(task_schema.names())).filter_by(task_id = task_id).first()
+    if result:
+        return task_schema.dump([result])[0]
+    return None
+
 # Routes
 
 @api_blueprint.route('/api/v1/tasks/')
+@read_only
 def api_tasks():
-    results = db.session.query(Task).limit(10).offset(0).all()
-    json_results = []
-    for result in results:
-        data = {
-            'task_id': result.task_id,
-            'task name': result.name,
-            'due date': str(result.due_date),
-            'priority': result.priority,
-            'posted date': str(result.posted_date),
-            'status': result.status,
-            'user id': result.user_id
-            }
-        json_results.append(data)
-    return jsonify(items=json_results)
+    cursor, limit, mimetype = request.args.get('cursor'), page_size(), response_mimetype()
+    try:
+        filters, sort, descending = list_query()
+        fields, encoding = fields_arg(), encoding_arg()
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    arguments = '&'.join('{}={}'.format(*item) for item in sorted(filters.items()) + [
+        ('sort', request.args.get('sort', sort)), ('fields', ','.join(fields))])
+    version, last_modified = tasks_version()
+    etag = 'tasks-{}-{}-{}-{}-{}-{}'.format(version, limit, cursor or '', arguments, encoding, mimetype)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
+    key = 'tasks:page:{}:{}:{}:{}'.format(version, cursor, limit, arguments)
+    try:
+        page = cache.get_or_set(key, lambda: tasks_page(cursor, limit, fields, filters, sort, descending))
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    return add_validators(encode_page(page, fields, encoding, mimetype), etag, last_modified)
+
+
+@api_blueprint.route('/api/v1/tasks/export')
+@read_only
+def export_tasks():
+    try:
+        query = export_query()
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+
+    # rows come straight off a server-side cursor, one line each, so memory
+    # stays flat however large the table is
+    serialize = task_schema.serializer(task_schema.names())
+    def generate():
+        for result in query.yield_per(current_app.config['API_EXPORT_BATCH_SIZE']):
+            yield dumps(serialize(result)) + b'\n'
+    return Response(stream_with_context(generate()), mimetype = 'application/x-ndjson')
+
+
+# ranked by relevance, served from the full-text index
+@api_blueprint.route('/api/v1/tasks/search')
+@read_only
+def search():
+    q, limit = request.args.get('q', '').strip(), page_size()
+    try:
+        page = int_arg('page') or 1
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    if not q:
+        return make_response(jsonify({"error": "Missing search query"}), 400)
+    page = max(page, 1)
+    key = 'tasks:search:{}:{}:{}:{}'.format(tasks_version()[0], q, page, limit)
+    return json_response(cache.get_or_set(key, lambda: search_page(q, page, limit)))
 
 
 @api_blueprint.route('/api/v1/tasks/<int:task_id>')
+@read_only
 def task(task_id):
-    result = db.session.query(Task).filter_by(task_id = task_id).first()
-    if result:
-        result = {
-            'task_id': result.task_id,
-            'task name': result.name,
-            'due date': str(result.due_date),
-            'priority': result.priority,
-            'posted date': str(result.posted_date),
-            'status': result.status,
-            'user id': result.user_id
-        }
-        code = 200
-    else:
-        result = {"error": "Element does not exist"}
-        code = 404
-    return make_response(jsonify(result), code)
\ No newline at end of file
+    try:
+        fields = fields_arg()
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    # the whole task is cached once, whatever the fields, with the validators
+    # it was read under
+    entry = cache.get(task_key(task_id))
+    if entry is None:
+        version, last_modified = tasks_version()
+        result = task_data(task_id)
+        if result is None:
+            return make_response(jsonify({"error": "Element does not exist"}), 404)
+        entry = {'version': version, 'last_modified': last_modified, 'item': result}
+        cache.set(task_key(task_id), entry)
+    etag = 'task-{}-{}-{}'.format(entry['version'], task_id, ','.join(fields))
+    response = not_modified(etag, entry['last_modified'])
+    if response:
+        return response
+    return add_validators(json_response(trim_item(entry['item'], fields)), etag, entry['last_modified'])
+
+
+@api_blueprint.route('/api/v1/tasks/bulk/create', methods = ['POST'])
+@api_login_required
+def bulk_create():
+    try:
+        items = bulk_payload('tasks')
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    results = create_tasks(items, session['user_id'])
+    return jsonify(results=results)
+
+
+@api_blueprint.route('/api/v1/tasks/bulk/complete', methods = ['POST'])
+@api_login_required
+def bulk_complete():
+    try:
+        ids = bulk_ids()
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    results = change_tasks(ids, 'complete', session['user_id'], session['role'] == 'admin')
+    return jsonify(results=results)
+
+
+@api_blueprint.route('/api/v1/tasks/bulk/delete', methods = ['POST'])
+@api_login_required
+def bulk_delete():
+    try:
+        ids = bulk_ids()
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    results = change_tasks(ids, 'delete', session['user_id'], session['role'] == 'admin')
+    return jsonify(results=results)
+
+
+# counts come from the trigger-maintained summary tables, never from tasks
+@api_blueprint.route('/api/v1/stats')
+@read_only
+def stats():
+    try:
+        user_id = int_arg('user_id')
+    except ValueError as error:
+        return make_response(jsonify({"error": str(error)}), 400)
+    result = summary(GLOBAL_USER_ID if user_id is None else user_id)
+    result['user_id'] = user_id
+    return jsonify(result)
+
+
+@api_blueprint.route('/api/v1/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats())
\ No newline at end of file
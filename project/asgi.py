@@ -0,0 +1,221 @@
+
+# project/asgi.py
+#
+# Usage: uvicorn project.asgi:application
+#
+# GET /api/v1/tasks/<id> is answered on the event loop through an async
+# database driver (aiosqlite or asyncpg); every other route runs on the Flask
+# app through asgiref's WSGI bridge, on a pool of REQUEST_THREADS threads.
+
+import asyncio
+import contextvars
+import datetime
+import functools
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from project import app, cache
+from project.api.fields import parse_fields, trim_item
+from project.conditional import http_last_modified, modified_since
+from project.serializers import dumps, task_schema
+from project.tasks.queries import task_key
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+# Config
+
+TASK_PATH = re.compile(r'^/api/v1/tasks/(\d+)$')
+
+TASK_QUERY = 'SELECT {} FROM tasks WHERE task_id = ?'.format(
+    ', '.join(column.name for column in task_schema.columns(task_schema.names())))
+
+VERSION_QUERY = "SELECT version, updated_at FROM table_versions WHERE name = 'tasks'"
+
+# Database
+
+# A fixed set of connections handed out through a queue; aiosqlite runs each
+# connection on its own thread, asyncpg brings its own pool
+class AsyncDatabase(object):
+
+    def __init__(self, uri, pool_size = 10, pragmas = None):
+        self.uri = uri
+        self.pool_size = pool_size
+        self.pragmas = pragmas or {}
+        self.postgres = uri.startswith(('postgres://', 'postgresql'))
+        self.pool = None
+        self._lock = None
+
+    @staticmethod
+    def available(uri):
+        if uri.startswith('sqlite:///'):
+            return aiosqlite is not None
+        if uri.startswith(('postgres://', 'postgresql')):
+            return asyncpg is not None
+        return False
+
+    async def connect(self):
+        # created on first use so it belongs to the server's event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.pool is not None:
+                return
+            if self.postgres:
+                dsn = re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql://', self.uri)
+                self.pool = await asyncpg.create_pool(dsn, max_size = self.pool_size)
+                return
+            pool = asyncio.Queue()
+            for _ in range(self.pool_size):
+                connection = await aiosqlite.connect(self.uri[len('sqlite:///'):], detect_types = sqlite3.PARSE_DECLTYPES)
+                for name, value in self.pragmas.items():
+                    await connection.execute('PRAGMA {}={}'.format(name, value))
+                pool.put_nowait(connection)
+            self.pool = pool
+
+    async def fetch_one(self, statement, *parameters):
+        if self.pool is None:
+            await self.connect()
+        if self.postgres:
+            count = iter(range(1, len(parameters) + 1))
+            statement = re.sub(r'\?', lambda match: '${}'.format(next(count)), statement)
+            row = await self.pool.fetchrow(statement, *parameters)
+            return tuple(row) if row is not None else None
+        connection = await self.pool.get()
+        try:
+            async with connection.execute(statement, parameters) as cursor:
+                return await cursor.fetchone()
+        finally:
+            self.pool.put_nowait(connection)
+
+    async def close(self):
+        if self.pool is None:
+            return
+        if self.postgres:
+            await self.pool.close()
+        else:
+            while not self.pool.empty():
+                await self.pool.get_nowait().close()
+        self.pool = None
+
+# WSGI bridge
+
+# asgiref runs every WSGI call on one shared thread (sync_to_async defaults to
+# thread_sensitive), which would serialize the whole Flask app per process.
+# These instances hand the same call to a bounded pool instead.
+class PooledWsgiInstance(WsgiToAsgiInstance):
+
+    def __init__(self, wsgi_application, executor):
+        WsgiToAsgiInstance.__init__(self, wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        run = functools.partial(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, self, body)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, contextvars.copy_context().run, run)
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+
+    def __init__(self, wsgi_application, threads):
+        WsgiToAsgi.__init__(self, wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers = threads, thread_name_prefix = 'wsgi')
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+# Helper functions
+
+def timestamp(value):
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+async def respond(send, status, body = b'', headers = (), head = False):
+    headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    if status != 304:
+        headers.append((b'content-type', b'application/json'))
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head or status == 304 else body})
+
+# Application
+
+class Application(object):
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = PooledWsgiToAsgi(flask_app, flask_app.config['REQUEST_THREADS'])
+        uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+        self.database = None
+        if AsyncDatabase.available(uri):
+            self.database = AsyncDatabase(uri, flask_app.config['DATABASE_POOL_SIZE'], flask_app.config['SQLITE_PRAGMAS'])
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and self.database is not None:
+            match = TASK_PATH.match(scope['path'])
+            if match:
+                return await self.task(scope, send, int(match.group(1)))
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.database is not None:
+                    await self.database.connect()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.database is not None:
+                    await self.database.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # Same responses, validators and cache entries as api.views.task
+    async def task(self, scope, send, task_id):
+        head = scope['method'] == 'HEAD'
+        headers = dict((name.decode('latin-1').lower(), value.decode('latin-1')) for name, value in scope['headers'])
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        try:
+            fields = parse_fields(query.get('fields', [None])[0])
+        except ValueError as error:
+            return await respond(send, 400, dumps({'error': str(error)}), head = head)
+
+        app_cache = cache.for_app(self.flask_app)
+        entry = app_cache.get(task_key(task_id))
+        if entry is None:
+            version, last_modified = await self.database.fetch_one(VERSION_QUERY) or (0, None)
+            row = await self.database.fetch_one(TASK_QUERY, task_id)
+            if row is None:
+                return await respond(send, 404, dumps({'error': 'Element does not exist'}), head = head)
+            entry = {'version': version, 'last_modified': timestamp(last_modified), 'item': task_schema.dump([row])[0]}
+            app_cache.set(task_key(task_id), entry)
+
+        last_modified = entry['last_modified']
+        etag = 'task-{}-{}-{}'.format(entry['version'], task_id, ','.join(fields))
+        validators = [('etag', quote_etag(etag)), ('cache-control', 'private, no-cache')]
+        if http_last_modified(last_modified) is not None:
+            validators.append(('last-modified', http_date(http_last_modified(last_modified))))
+        if 'if-none-match' in headers:
+            matched = parse_etags(headers['if-none-match']).contains(etag)
+        else:
+            matched = last_modified is not None and \
+                not modified_since(last_modified, parse_date(headers.get('if-modified-since')))
+        if matched:
+            return await respond(send, 304, headers = validators)
+        return await respond(send, 200, dumps(trim_item(entry['item'], fields)), validators, head)
+
+application = Application(app)
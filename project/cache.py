@@ -0,0 +1,270 @@
+
+# project/cache.py
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+# Backends
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+class LRUCache(object):
+
+    def __init__(self, threshold = 1000):
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, timeout):
+        expires = time.time() + timeout if timeout else 0
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.threshold:
+                self._entries.popitem(last = False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Entries are pickled to one file per key so every worker on the host shares
+# them; the least recently used files are pruned past the threshold. Listing
+# and sorting the directory is the expensive part, so each worker only prunes
+# every prune_interval sets and the directory may briefly run over.
+class FileCache(object):
+
+    def __init__(self, directory, threshold = 1000, prune_interval = 100):
+        self.directory = directory
+        self.threshold = threshold
+        self.prune_interval = max(1, prune_interval)
+        self._sets = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def _files(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.cache')]
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if entry[0] and entry[0] < time.time():
+            self.delete(key)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key, value, timeout):
+        expires = time.time() + timeout if timeout else 0
+        handle, temporary = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        with os.fdopen(handle, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self._path(key))
+        with self._lock:
+            self._sets += 1
+            due = self._sets % self.prune_interval == 0
+        if due:
+            self._prune()
+
+    def _prune(self):
+        files = self._files()
+        if len(files) <= self.threshold:
+            return
+        def mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+        files.sort(key = mtime)
+        for path in files[:len(files) - self.threshold]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for path in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._files())
+
+# Extension
+
+# One backend and its counters per app
+class AppCache(object):
+
+    def __init__(self, backend, default_timeout = 300):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default = None):
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, timeout = None):
+        self.backend.set(key, value, self.default_timeout if timeout is None else timeout)
+
+    # Returns the cached value for key, computing and storing it on a miss;
+    # a None result is not cached
+    def get_or_set(self, key, function, timeout = None):
+        entry = self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = function()
+        if value is not None:
+            self.set(key, value, timeout)
+        return value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.backend)
+        }
+
+# Each app keeps its own AppCache in app.extensions['cache'] and the extension
+# forwards to the current app's. Outside an app context it falls back to the
+# last app set up.
+class Cache(object):
+
+    def __init__(self, app = None):
+        self._default = AppCache(NullCache())
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_THRESHOLD', 1000)
+        app.config.setdefault('CACHE_PRUNE_INTERVAL', 100)
+        app.config.setdefault('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'flasktaskr-cache'))
+        cache_type = app.config['CACHE_TYPE']
+        if cache_type == 'lru':
+            backend = LRUCache(app.config['CACHE_THRESHOLD'])
+        elif cache_type == 'file':
+            backend = FileCache(app.config['CACHE_DIR'], app.config['CACHE_THRESHOLD'], app.config['CACHE_PRUNE_INTERVAL'])
+        elif cache_type == 'null':
+            backend = NullCache()
+        else:
+            raise ValueError('Unknown cache type: {}'.format(cache_type))
+        app.extensions['cache'] = self._default = AppCache(backend, app.config['CACHE_DEFAULT_TIMEOUT'])
+
+    def for_app(self, app):
+        return app.extensions.get('cache', self._default)
+
+    @property
+    def current(self):
+        if has_app_context():
+            return self.for_app(current_app)
+        return self._default
+
+    @property
+    def backend(self):
+        return self.current.backend
+
+    @backend.setter
+    def backend(self, backend):
+        self.current.backend = backend
+
+    @property
+    def hits(self):
+        return self.current.hits
+
+    @property
+    def misses(self):
+        return self.current.misses
+
+    def get(self, key, default = None):
+        return self.current.get(key, default)
+
+    def set(self, key, value, timeout = None):
+        self.current.set(key, value, timeout)
+
+    def get_or_set(self, key, function, timeout = None):
+        return self.current.get_or_set(key, function, timeout)
+
+    def delete(self, *keys):
+        self.current.delete(*keys)
+
+    def clear(self):
+        self.current.clear()
+
+    def stats(self):
+        return self.current.stats()
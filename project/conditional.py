@@ -0,0 +1,42 @@
+
+# project/conditional.py
+
+import datetime
+
+from flask import make_response, request
+
+# Helper functions
+
+# HTTP dates only carry whole seconds, while updated_at keeps microseconds.
+# Last-Modified is rounded up to the end of the second of the last write and
+# only sent once that second is over, so a later write in the same second can
+# never be answered with a 304 to its If-Modified-Since.
+def http_last_modified(updated_at, now = None):
+    if updated_at is None:
+        return None
+    rounded = updated_at.replace(microsecond = 0)
+    if rounded < updated_at:
+        rounded += datetime.timedelta(seconds = 1)
+    if rounded > (now or datetime.datetime.utcnow()):
+        return None
+    return rounded
+
+def modified_since(updated_at, since):
+    return http_last_modified(updated_at) is None or since is None or updated_at > since.replace(tzinfo = None)
+
+def not_modified(etag, last_modified = None):
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    else:
+        matched = last_modified is not None and not modified_since(last_modified, request.if_modified_since)
+    if not matched:
+        return None
+    return add_validators(make_response('', 304), etag, last_modified)
+
+def add_validators(response, etag, last_modified = None):
+    response.set_etag(etag)
+    last_modified = http_last_modified(last_modified)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
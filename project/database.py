@@ -0,0 +1,175 @@
+
+# project/database.py
+
+import itertools
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql.expression import UpdateBase
+
+# Helper functions
+
+# Marks a view as safe to serve from a replica; only GET and HEAD requests
+# are routed there
+def read_only(view):
+    @wraps(view)
+    def wrap(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.database_read_only = True
+        return view(*args, **kwargs)
+    return wrap
+
+# Applies an app's SQLITE_PRAGMAS to every new connection of its engines
+def pragma_listener(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {}={}'.format(name, value))
+        cursor.close()
+    return on_connect
+
+# apply_driver_hacks passes the app's pragmas along with the engine options
+def build_engine(url, options):
+    options = dict(options)
+    pragmas = options.pop('sqlite_pragmas', None)
+    engine = create_engine(url, **options)
+    if pragmas is not None:
+        event.listen(engine, 'connect', pragma_listener(pragmas))
+    return engine
+
+# Replicas
+
+class ReplicaSet(object):
+
+    def __init__(self, uris, selection, options):
+        self.engines = [build_engine(uri, options.get(uri, {})) for uri in uris]
+        self.selection = selection
+        self.in_use = dict((engine, 0) for engine in self.engines)
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(self.engines)
+        for engine in self.engines:
+            event.listen(engine, 'checkout', self._checkout(engine))
+            event.listen(engine, 'checkin', self._checkin(engine))
+
+    def _checkout(self, engine):
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.in_use[engine] += 1
+        return checkout
+
+    def _checkin(self, engine):
+        def checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.in_use[engine] -= 1
+        return checkin
+
+    def choose(self):
+        with self._lock:
+            if self.selection == 'least_loaded':
+                return min(self.engines, key = lambda engine: self.in_use[engine])
+            return next(self._cycle)
+
+# Routes the reads of read-only views to a replica. Any write, and every read
+# after it in the same request, goes to the primary, and the user's next
+# requests stay there for DATABASE_REPLICA_STICKY_SECONDS so they read their
+# own writes.
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper = None, clause = None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.mark_primary()
+        elif self.use_replica():
+            engine = self.request_replica()
+            if engine is not None:
+                return engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+    # The replica is picked once per request, so a page and its count, or an
+    # ETag version and the body, come from the same replica and the same lag
+    def request_replica(self):
+        if 'database_replica' not in g:
+            g.database_replica = self.db.replica_engine()
+        return g.database_replica
+
+    def use_replica(self):
+        return has_request_context() and \
+            g.get('database_read_only', False) and \
+            not g.get('database_primary', False) and \
+            session.get('_primary_until', 0) < time.time()
+
+    def mark_primary(self):
+        if has_request_context():
+            g.database_primary = True
+            session['_primary_until'] = time.time() + self.app.config['DATABASE_REPLICA_STICKY_SECONDS']
+
+# Extension
+
+# Adds the production database profile on top of Flask-SQLAlchemy: a sized,
+# pre-pinged connection pool for server databases and per-connection PRAGMAs
+# for SQLite
+class SQLAlchemy(BaseSQLAlchemy):
+
+    def __init__(self, *args, **kwargs):
+        self._replicas = {}
+        self._replicas_lock = threading.Lock()
+        super(SQLAlchemy, self).__init__(*args, **kwargs)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_POOL_SIZE', 10)
+        app.config.setdefault('DATABASE_MAX_OVERFLOW', 20)
+        app.config.setdefault('DATABASE_POOL_TIMEOUT', 10)
+        app.config.setdefault('DATABASE_POOL_RECYCLE', 1800)
+        app.config.setdefault('DATABASE_POOL_PRE_PING', True)
+        app.config.setdefault('SQLITE_PRAGMAS', {})
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('DATABASE_REPLICA_SELECTION', 'round_robin')
+        app.config.setdefault('DATABASE_REPLICA_STICKY_SECONDS', 5)
+        super(SQLAlchemy, self).init_app(app)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_ = RoutingSession, db = self, **options)
+
+    def replica_engine(self):
+        app = self.get_app()
+        uris = tuple(app.config['SQLALCHEMY_REPLICA_URIS'])
+        if not uris:
+            return None
+        key = (uris, app.config['DATABASE_REPLICA_SELECTION'])
+        replicas = self._replicas.get(key)
+        if replicas is None:
+            with self._replicas_lock:
+                replicas = self._replicas.get(key)
+                if replicas is None:
+                    options = {}
+                    for uri in uris:
+                        options[uri] = {}
+                        self.apply_driver_hacks(app, make_url(uri), options[uri])
+                    replicas = self._replicas[key] = ReplicaSet(uris, key[1], options)
+        return replicas.choose()
+
+    def apply_driver_hacks(self, app, info, options):
+        rv = super(SQLAlchemy, self).apply_driver_hacks(app, info, options)
+        if info.drivername.startswith('sqlite'):
+            options['sqlite_pragmas'] = app.config['SQLITE_PRAGMAS']
+        else:
+            options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+            options.setdefault('pool_recycle', app.config['DATABASE_POOL_RECYCLE'])
+            options.setdefault('pool_pre_ping', app.config['DATABASE_POOL_PRE_PING'])
+        return rv
+
+    def create_engine(self, sa_url, engine_opts):
+        return build_engine(sa_url, engine_opts)
@@ -0,0 +1,209 @@
+
+# project/logs.py
+
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from flask import current_app, has_app_context
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Handlers
+
+# Never blocks the request: when the queue is full the record is dropped and
+# counted instead
+class DroppingQueueHandler(logging.Handler):
+
+    def __init__(self, writer):
+        logging.Handler.__init__(self)
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            self.writer.enqueue(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+# Drains the queue from a background thread and appends whole batches to the
+# log file with a single write. The file is opened with O_APPEND and reopened
+# whenever another worker rotated it, and rotation itself happens under an
+# exclusive lock, so several gunicorn workers can share one log file.
+class BufferedLogWriter(object):
+
+    def __init__(self, path, queue_size = 10000, batch_size = 500, flush_interval = 1.0,
+            max_bytes = 10 * 1024 * 1024, backup_count = 5):
+        self.path = os.path.abspath(path)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.written = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._fd = None
+        self._inode = None
+        atexit.register(self.close)
+
+    # the thread and queue are created lazily in each process, so a writer
+    # set up before gunicorn forks still works in every worker
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._fd = None
+            self._thread = threading.Thread(target = self._run, name = 'log-writer')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, line):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        if self._pid == os.getpid():
+            try:
+                self._queue.put(None, timeout = self.flush_interval)
+            except queue.Full:
+                return
+            self._thread.join(self.flush_interval * 5)
+            self._pid = None
+
+    def _run(self):
+        while True:
+            try:
+                line = self._queue.get(timeout = self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [line]
+            while line is not None and len(batch) < self.batch_size:
+                try:
+                    line = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(line)
+            lines = [line for line in batch if line is not None]
+            try:
+                if lines:
+                    self._write(''.join(lines).encode('utf-8'))
+                    self.written += len(lines)
+            except OSError:
+                self.dropped += len(lines)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(lines) < len(batch):
+                return
+
+    def _open(self):
+        if self._fd is not None:
+            try:
+                if os.stat(self.path).st_ino == self._inode:
+                    return
+            except OSError:
+                pass
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+
+    def _write(self, data):
+        self._open()
+        if self.max_bytes and os.fstat(self._fd).st_size + len(data) > self.max_bytes:
+            self._rotate()
+        os.write(self._fd, data)
+
+    def _rotate(self):
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # another worker may have rotated while we waited for the lock
+                if os.stat(self.path).st_size >= self.max_bytes or os.stat(self.path).st_ino == self._inode:
+                    for index in range(self.backup_count - 1, 0, -1):
+                        source = '{}.{}'.format(self.path, index)
+                        if os.path.exists(source):
+                            os.replace(source, '{}.{}'.format(self.path, index + 1))
+                    if self.backup_count:
+                        os.replace(self.path, self.path + '.1')
+                    else:
+                        os.remove(self.path)
+            except OSError:
+                pass
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        self._open()
+
+# Extension
+
+# Each app gets its own writer and logger in app.extensions['error_log'];
+# outside an app context the last app set up is used
+class ErrorLog(object):
+
+    def __init__(self, app = None):
+        self._default = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ERROR_LOG_PATH', 'error.log')
+        app.config.setdefault('ERROR_LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('ERROR_LOG_BATCH_SIZE', 500)
+        app.config.setdefault('ERROR_LOG_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('ERROR_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('ERROR_LOG_BACKUP_COUNT', 5)
+        writer = BufferedLogWriter(
+            app.config['ERROR_LOG_PATH'],
+            queue_size = app.config['ERROR_LOG_QUEUE_SIZE'],
+            batch_size = app.config['ERROR_LOG_BATCH_SIZE'],
+            flush_interval = app.config['ERROR_LOG_FLUSH_INTERVAL'],
+            max_bytes = app.config['ERROR_LOG_MAX_BYTES'],
+            backup_count = app.config['ERROR_LOG_BACKUP_COUNT']
+            )
+        handler = DroppingQueueHandler(writer)
+        handler.setFormatter(logging.Formatter('\n%(message)s'))
+        # not registered with logging, so it goes away with the app
+        logger = logging.Logger('flasktaskr.errors', logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        app.extensions['error_log'] = self._default = (writer, logger)
+
+    @property
+    def current(self):
+        if has_app_context():
+            return current_app.extensions.get('error_log', self._default)
+        return self._default
+
+    @property
+    def writer(self):
+        return self.current[0]
+
+    @property
+    def logger(self):
+        return self.current[1]
+
+    # records keep the historical format: "<status> error at <timestamp>: <url>"
+    def error(self, status, timestamp, url):
+        self.logger.error('%s error at %s: %s', status, timestamp.strftime('%d-%m-%Y %H:%M:%S'), url,
+            extra = {'status': status, 'url': url})
+
+    def flush(self):
+        self.writer.flush()
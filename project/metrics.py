@@ -0,0 +1,143 @@
+
+# project/metrics.py
+
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Config
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# Histograms
+
+class Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield '{:g}'.format(bound), cumulative
+        yield '+Inf', self.count
+
+class HistogramFamily(object):
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.histograms = OrderedDict()
+
+    def observe(self, endpoint, value):
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            histogram = self.histograms.setdefault(endpoint, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def render(self):
+        lines = [
+            '# HELP {} {}'.format(self.name, self.help),
+            '# TYPE {} histogram'.format(self.name)
+        ]
+        for endpoint, histogram in sorted(self.histograms.items()):
+            for bound, count in histogram.samples():
+                lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(self.name, endpoint, bound, count))
+            lines.append('{}_sum{{endpoint="{}"}} {!r}'.format(self.name, endpoint, histogram.sum))
+            lines.append('{}_count{{endpoint="{}"}} {}'.format(self.name, endpoint, histogram.count))
+        return lines
+
+# SQL and template timings are accumulated on ``g`` for the current request
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('metrics_query_start', None)
+    if started is not None and has_request_context() and hasattr(g, 'metrics_started'):
+        g.metrics_queries += 1
+        g.metrics_sql_time += time.perf_counter() - started
+
+def before_template(sender, template, context, **extra):
+    if hasattr(g, 'metrics_started'):
+        g.metrics_template_start.append(time.perf_counter())
+
+def after_template(sender, template, context, **extra):
+    if hasattr(g, 'metrics_started') and g.metrics_template_start:
+        elapsed = time.perf_counter() - g.metrics_template_start.pop()
+        # included templates render inside their parent, count the outermost only
+        if not g.metrics_template_start:
+            g.metrics_template_time += elapsed
+
+# Extension
+
+class Metrics(object):
+
+    def __init__(self, app = None):
+        self._lock = threading.Lock()
+        self.families = OrderedDict([
+            ('request', HistogramFamily('flasktaskr_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS)),
+            ('queries', HistogramFamily('flasktaskr_sql_queries', 'SQL statements executed per request.', COUNT_BUCKETS)),
+            ('sql', HistogramFamily('flasktaskr_sql_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)),
+            ('template', HistogramFamily('flasktaskr_template_render_seconds', 'Template render time per request.', DURATION_BUCKETS))
+        ])
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        before_render_template.connect(before_template, app)
+        template_rendered.connect(after_template, app)
+        app.before_request(self.start_request)
+        app.teardown_request(self.finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_template_start = []
+        g.metrics_template_time = 0.0
+
+    def finish_request(self, exception = None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self.families['request'].observe(endpoint, elapsed)
+            self.families['queries'].observe(endpoint, g.metrics_queries)
+            self.families['sql'].observe(endpoint, g.metrics_sql_time)
+            self.families['template'].observe(endpoint, g.metrics_template_time)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for family in self.families.values():
+                lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype = 'text/plain; version=0.0.4')
@@ -2,11 +2,21 @@
 # project/models.py
 
 from project import db
+from sqlalchemy.dialects import postgresql, sqlite
 import datetime
 
 class Task(db.Model):
 
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_status_due_date_task_id', 'status', 'due_date', 'task_id'),
+        db.Index('ix_tasks_user_id_status_due_date', 'user_id', 'status', 'due_date', 'task_id'),
+        db.Index('ix_tasks_due_date_task_id', 'due_date', 'task_id'),
+        # sort keys offered by the API (see project/api/planner.py)
+        db.Index('ix_tasks_user_id_due_date', 'user_id', 'due_date', 'task_id'),
+        db.Index('ix_tasks_posted_date_task_id', 'posted_date', 'task_id'),
+        db.Index('ix_tasks_priority_task_id', 'priority', 'task_id')
+    )
 
     task_id = db.Column(db.Integer, primary_key = True)
     name = db.Column(db.String, nullable = False)
@@ -47,4 +57,59 @@ class User(db.Model):
         self.role = role
 
     def __repr__(self):
-        return '<User: {0}>'.format(self.name)
\ No newline at end of file
+        return '<User: {0}>'.format(self.name)
+
+class TableVersion(db.Model):
+
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String, primary_key = True)
+    version = db.Column(db.Integer, nullable = False, default = 0)
+    updated_at = db.Column(db.DateTime, nullable = False)
+
+
+    def __init__(self, name, version, updated_at):
+        self.name = name
+        self.version = version
+        self.updated_at = updated_at
+
+    def __repr__(self):
+        return '<TableVersion: {0} {1}>'.format(self.name, self.version)
+
+    # Bumps the version in one statement, creating the row on the first write;
+    # an update followed by an insert lets two first writers both insert
+    @classmethod
+    def bump(cls, dialect_name, name, now):
+        table = cls.__table__
+        dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+        statement = dialects[dialect_name].insert(table).values(name = name, version = 1, updated_at = now)
+        return statement.on_conflict_do_update(
+            index_elements = [table.c.name],
+            set_ = {'version': table.c.version + 1, 'updated_at': now}
+            )
+
+# Maintained by triggers on tasks (see project/stats.py); user_id 0 holds the
+# totals across all users
+class TaskCount(db.Model):
+
+    __tablename__ = 'task_counts'
+
+    user_id = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    status = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    priority = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    count = db.Column(db.Integer, nullable = False, default = 0)
+
+    def __repr__(self):
+        return '<TaskCount: {0} {1} {2}>'.format(self.user_id, self.status, self.priority)
+
+# Open tasks per due date, so overdue counts never scan tasks
+class TaskDueCount(db.Model):
+
+    __tablename__ = 'task_due_counts'
+
+    user_id = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    due_date = db.Column(db.Date, primary_key = True)
+    count = db.Column(db.Integer, nullable = False, default = 0)
+
+    def __repr__(self):
+        return '<TaskDueCount: {0} {1}>'.format(self.user_id, self.due_date)
\ No newline at end of file
@@ -0,0 +1,93 @@
+
+# project/search.py
+
+import re
+
+from sqlalchemy import DDL, event, text
+
+from project import db
+from project.models import Task
+
+# Config
+
+# SQLite keeps an external-content FTS5 index in sync through triggers,
+# PostgreSQL an expression GIN index that needs no maintenance
+SQLITE_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(name, content = 'tasks', content_rowid = 'task_id')",
+    'CREATE TRIGGER IF NOT EXISTS tasks_search_insert AFTER INSERT ON tasks BEGIN '
+    'INSERT INTO tasks_fts (rowid, name) VALUES (NEW.task_id, NEW.name); END',
+    'CREATE TRIGGER IF NOT EXISTS tasks_search_delete AFTER DELETE ON tasks BEGIN '
+    "INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', OLD.task_id, OLD.name); END",
+    'CREATE TRIGGER IF NOT EXISTS tasks_search_update AFTER UPDATE OF task_id, name ON tasks BEGIN '
+    "INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', OLD.task_id, OLD.name); "
+    'INSERT INTO tasks_fts (rowid, name) VALUES (NEW.task_id, NEW.name); END'
+]
+
+POSTGRES_SEARCH = [
+    "CREATE INDEX IF NOT EXISTS ix_tasks_name_search ON tasks USING GIN (to_tsvector('simple', name))"
+]
+
+SQLITE_RANKED = '''
+    SELECT tasks_fts.rowid FROM tasks_fts
+    WHERE tasks_fts MATCH :query
+    ORDER BY rank, tasks_fts.rowid
+    LIMIT :limit OFFSET :offset
+'''
+
+POSTGRES_RANKED = '''
+    SELECT task_id FROM tasks, to_tsquery('simple', :query) AS query
+    WHERE to_tsvector('simple', name) @@ query
+    ORDER BY ts_rank(to_tsvector('simple', name), query) DESC, task_id
+    LIMIT :limit OFFSET :offset
+'''
+
+for statement in SQLITE_SEARCH:
+    event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect = 'sqlite'))
+for statement in POSTGRES_SEARCH:
+    event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect = 'postgresql'))
+# the external-content index would outlive tasks and go stale otherwise
+event.listen(Task.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS tasks_fts').execute_if(dialect = 'sqlite'))
+
+# Helper functions
+
+def search_terms(q):
+    return re.findall(r'\w+', q or '', re.UNICODE)
+
+# Every word must match, as a prefix so results show up while typing
+def match_query(terms, dialect):
+    if dialect == 'postgresql':
+        return ' & '.join('{}:*'.format(term) for term in terms)
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+def ranked_task_ids(q, limit, offset = 0):
+    terms = search_terms(q)
+    if not terms:
+        return []
+    dialect = db.session.get_bind(Task.__mapper__).dialect.name
+    statement = text(POSTGRES_RANKED if dialect == 'postgresql' else SQLITE_RANKED)
+    rows = db.session.execute(statement, {
+        'query': match_query(terms, dialect),
+        'limit': limit,
+        'offset': offset
+        })
+    return [row[0] for row in rows]
+
+# Returns one page of tasks in rank order and whether another page follows
+def search_tasks(q, page, per_page, *options):
+    ids = ranked_task_ids(q, per_page + 1, (page - 1) * per_page)
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return [], has_next
+    tasks = dict((task.task_id, task) for task in
+        db.session.query(Task).options(*options).filter(Task.task_id.in_(ids)))
+    return [tasks[task_id] for task_id in ids if task_id in tasks], has_next
+
+def install_search(connection):
+    if connection.dialect.name == 'postgresql':
+        for statement in POSTGRES_SEARCH:
+            connection.execute(text(statement))
+    else:
+        for statement in SQLITE_SEARCH:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"))
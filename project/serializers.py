@@ -0,0 +1,82 @@
+
+# project/serializers.py
+
+import json
+from collections import OrderedDict
+
+from project.models import Task, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Serializers
+
+# Maps field names to columns and response keys, and compiles one plain
+# function per (fields, selected columns) pair that turns a Core row tuple into
+# a dict by position, with no ORM instances or per-field lookups in between
+class Schema(object):
+
+    def __init__(self, fields, dates = ()):
+        self.fields = OrderedDict((name, (column, key)) for name, column, key in fields)
+        self.dates = set(dates)
+        self.compiled = {}
+
+    def names(self, fields = None, *required):
+        fields = list(self.fields) if fields is None else list(fields)
+        fields += [name for name in required if name not in fields]
+        return [name for name in self.fields if name in fields]
+
+    def columns(self, names):
+        return [self.fields[name][0] for name in names]
+
+    def keys(self, fields):
+        return [self.fields[name][1] for name in fields]
+
+    def serializer(self, fields, selected = None):
+        fields, selected = tuple(fields), tuple(selected or fields)
+        function = self.compiled.get((fields, selected))
+        if function is None:
+            function = self.compiled[(fields, selected)] = self.compile(fields, selected)
+        return function
+
+    def compile(self, fields, selected):
+        items = []
+        for name in fields:
+            value = 'row[{}]'.format(selected.index(name))
+            if name in self.dates:
+                value = '(None if {0} is None else {0}.isoformat())'.format(value)
+            items.append('{!r}: {}'.format(self.fields[name][1], value))
+        source = 'def serialize(row):\n    return {{{}}}\n'.format(', '.join(items))
+        namespace = {}
+        exec(compile(source, '<schema {}>'.format(', '.join(fields)), 'exec'), namespace)
+        return namespace['serialize']
+
+    def dump(self, rows, fields = None, selected = None):
+        serialize = self.serializer(self.names(fields), selected)
+        return [serialize(row) for row in rows]
+
+task_schema = Schema([
+    ('task_id', Task.task_id, 'task_id'),
+    ('name', Task.name, 'task name'),
+    ('due_date', Task.due_date, 'due date'),
+    ('priority', Task.priority, 'priority'),
+    ('posted_date', Task.posted_date, 'posted date'),
+    ('status', Task.status, 'status'),
+    ('user_id', Task.user_id, 'user id')
+], dates = ('due_date', 'posted_date'))
+
+user_schema = Schema([
+    ('user_id', User.user_id, 'user_id'),
+    ('name', User.name, 'name'),
+    ('email', User.email, 'email'),
+    ('role', User.role, 'role')
+])
+
+# Helper functions
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators = (',', ':')).encode('utf-8')
@@ -0,0 +1,192 @@
+
+# project/sessions.py
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+# Stores
+
+class MemorySessionStore(object):
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        entry = self._sessions.get(sid)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def save(self, sid, data, expires):
+        with self._lock:
+            self._sessions[sid] = (data, expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, entry in self._sessions.items() if entry[1] < now]:
+                del self._sessions[sid]
+
+    def __len__(self):
+        return len(self._sessions)
+
+# One small SQLite file shared by every worker on the host
+class SqliteSessionStore(object):
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)'
+                )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout = 5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def load(self, sid):
+        row = self._connection().execute(
+            'SELECT data FROM sessions WHERE sid = ? AND expires >= ?', (sid, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data, expires):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)', (sid, data, expires))
+
+    def delete(self, sid):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+# Sessions
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial = None, sid = None, new = False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    # issues a fresh id, e.g. on login, so an id planted before authentication
+    # cannot be reused afterwards
+    def regenerate(self):
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(24)
+        self.new = True
+        self.modified = True
+
+# The cookie only carries a random session id; the data, including the
+# logged in user's id, name and role, lives in the store, so requests neither
+# re-sign the session nor look the user up again
+class ServerSideSessionInterface(SessionInterface):
+
+    serializer = session_json_serializer
+
+    def __init__(self, store, sweep_interval = 300):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.time()
+
+    def cookie_name(self, app):
+        return app.config['SESSION_COOKIE_NAME']
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSideSession(self.serializer.loads(data), sid = sid)
+        return ServerSideSession(sid = secrets.token_urlsafe(24), new = True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(self.cookie_name(app), domain = domain, path = path)
+            return
+        if session.modified:
+            expires = time.time() + app.permanent_session_lifetime.total_seconds()
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), expires)
+            self.maybe_sweep()
+        if session.new or (session.permanent and app.config.get('SESSION_REFRESH_EACH_REQUEST', True)):
+            response.set_cookie(
+                self.cookie_name(app),
+                session.sid,
+                expires = self.get_expiration_time(app, session),
+                httponly = self.get_cookie_httponly(app),
+                domain = domain,
+                path = path,
+                secure = self.get_cookie_secure(app)
+                )
+
+    def maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.store.sweep()
+
+# Extension
+
+# The store of each app lives in app.extensions['sessions'] and on its session
+# interface
+class ServerSideSessions(object):
+
+    def __init__(self, app = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_BACKEND', None)
+        app.config.setdefault('SESSION_SQLITE_PATH', 'sessions.db')
+        app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+        backend = app.config['SESSION_BACKEND']
+        if not backend:
+            return
+        if backend == 'memory':
+            store = MemorySessionStore()
+        elif backend == 'sqlite':
+            store = SqliteSessionStore(app.config['SESSION_SQLITE_PATH'])
+        else:
+            raise ValueError('Unknown session backend: {}'.format(backend))
+        app.extensions['sessions'] = store
+        app.session_interface = ServerSideSessionInterface(store, app.config['SESSION_SWEEP_INTERVAL'])
+
+    @property
+    def store(self):
+        return current_app.extensions.get('sessions')
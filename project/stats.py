@@ -0,0 +1,143 @@
+
+# project/stats.py
+
+import datetime
+
+from sqlalchemy import DDL, event, text
+
+from project import db
+from project.models import Task, TaskCount, TaskDueCount
+
+# Config
+
+GLOBAL_USER_ID = 0
+
+# tasks without a user or status are counted under -1
+KEYS = {
+    'user_id': 'COALESCE({row}.user_id, -1)',
+    'status': 'COALESCE({row}.status, -1)',
+    'priority': 'COALESCE({row}.priority, -1)'
+}
+
+# Triggers
+
+def sqlite_adjust(row, delta):
+    key = dict((name, expression.format(row = row)) for name, expression in KEYS.items())
+    statements = []
+    for user_id in (key['user_id'], str(GLOBAL_USER_ID)):
+        statements.append(
+            'INSERT OR IGNORE INTO task_counts (user_id, status, priority, count) '
+            'VALUES ({0}, {1}, {2}, 0);'.format(user_id, key['status'], key['priority'])
+            )
+        statements.append(
+            'UPDATE task_counts SET count = count + ({0}) '
+            'WHERE user_id = {1} AND status = {2} AND priority = {3};'.format(delta, user_id, key['status'], key['priority'])
+            )
+        statements.append(
+            'INSERT OR IGNORE INTO task_due_counts (user_id, due_date, count) '
+            'SELECT {0}, {1}.due_date, 0 WHERE {1}.status = 1;'.format(user_id, row)
+            )
+        statements.append(
+            'UPDATE task_due_counts SET count = count + ({0}) '
+            'WHERE {1}.status = 1 AND user_id = {2} AND due_date = {1}.due_date;'.format(delta, row, user_id)
+            )
+    return '\n'.join(statements)
+
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS tasks_stats_insert AFTER INSERT ON tasks BEGIN\n{}\nEND'.format(sqlite_adjust('NEW', 1)),
+    'CREATE TRIGGER IF NOT EXISTS tasks_stats_delete AFTER DELETE ON tasks BEGIN\n{}\nEND'.format(sqlite_adjust('OLD', -1)),
+    'CREATE TRIGGER IF NOT EXISTS tasks_stats_update AFTER UPDATE OF user_id, status, priority, due_date ON tasks BEGIN\n{}\n{}\nEND'.format(
+        sqlite_adjust('OLD', -1), sqlite_adjust('NEW', 1))
+]
+
+POSTGRES_TRIGGERS = [
+    '''
+    CREATE OR REPLACE FUNCTION task_stats_adjust(_user_id integer, _status integer, _priority integer, _due_date date, _delta integer)
+    RETURNS void AS $$
+    DECLARE
+        _owner integer;
+    BEGIN
+        FOREACH _owner IN ARRAY ARRAY[COALESCE(_user_id, -1), 0] LOOP
+            INSERT INTO task_counts (user_id, status, priority, count)
+            VALUES (_owner, COALESCE(_status, -1), COALESCE(_priority, -1), _delta)
+            ON CONFLICT (user_id, status, priority) DO UPDATE SET count = task_counts.count + _delta;
+            IF _status = 1 THEN
+                INSERT INTO task_due_counts (user_id, due_date, count)
+                VALUES (_owner, _due_date, _delta)
+                ON CONFLICT (user_id, due_date) DO UPDATE SET count = task_due_counts.count + _delta;
+            END IF;
+        END LOOP;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION tasks_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM task_stats_adjust(OLD.user_id, OLD.status, OLD.priority, OLD.due_date, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM task_stats_adjust(NEW.user_id, NEW.status, NEW.priority, NEW.due_date, 1);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS tasks_stats ON tasks',
+    'CREATE TRIGGER tasks_stats AFTER INSERT OR DELETE OR UPDATE OF user_id, status, priority, due_date ON tasks '
+    'FOR EACH ROW EXECUTE PROCEDURE tasks_stats()'
+]
+
+for statement in SQLITE_TRIGGERS:
+    event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect = 'sqlite'))
+for statement in POSTGRES_TRIGGERS:
+    event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect = 'postgresql'))
+
+# Helper functions
+
+def install_triggers(connection):
+    TaskCount.__table__.create(connection, checkfirst = True)
+    TaskDueCount.__table__.create(connection, checkfirst = True)
+    statements = POSTGRES_TRIGGERS if connection.dialect.name == 'postgresql' else SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+# Recomputes both summary tables from tasks; the table is locked against
+# writers meanwhile so no trigger update is lost
+def rebuild(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('LOCK TABLE tasks IN SHARE MODE'))
+    connection.execute(text('DELETE FROM task_counts'))
+    connection.execute(text('DELETE FROM task_due_counts'))
+    key = ', '.join(expression.format(row = 'tasks') for expression in KEYS.values())
+    connection.execute(text(
+        'INSERT INTO task_counts (user_id, status, priority, count) '
+        'SELECT {0}, COUNT(*) FROM tasks GROUP BY {0}'.format(key)
+        ))
+    connection.execute(text(
+        'INSERT INTO task_counts (user_id, status, priority, count) '
+        'SELECT 0, status, priority, SUM(count) FROM task_counts GROUP BY status, priority'
+        ))
+    connection.execute(text(
+        'INSERT INTO task_due_counts (user_id, due_date, count) '
+        'SELECT COALESCE(user_id, -1), due_date, COUNT(*) FROM tasks WHERE status = 1 GROUP BY COALESCE(user_id, -1), due_date'
+        ))
+    connection.execute(text(
+        'INSERT INTO task_due_counts (user_id, due_date, count) '
+        'SELECT 0, due_date, SUM(count) FROM task_due_counts GROUP BY due_date'
+        ))
+
+def summary(user_id = GLOBAL_USER_ID, today = None):
+    today = today or datetime.date.today()
+    result = {'open': 0, 'closed': 0, 'overdue': 0, 'priorities': {}}
+    for status, priority, count in db.session.query(TaskCount.status, TaskCount.priority, TaskCount.count).filter(
+            TaskCount.user_id == user_id):
+        section = 'open' if status == 1 else 'closed' if status == 0 else None
+        if section is None or not count:
+            continue
+        result[section] += count
+        breakdown = result['priorities'].setdefault(str(priority), {'open': 0, 'closed': 0})
+        breakdown[section] += count
+    result['overdue'] = db.session.query(db.func.coalesce(db.func.sum(TaskDueCount.count), 0)).filter(
+        TaskDueCount.user_id == user_id, TaskDueCount.due_date < today).scalar()
+    return result
@@ -0,0 +1,85 @@
+
+# project/tasks/queries.py
+
+import datetime
+
+from flask import current_app
+from sqlalchemy.orm import joinedload, lazyload, selectinload, subqueryload
+
+from project import db, cache
+from project.models import Task, TableVersion
+
+# Config
+
+POSTER_LOADERS = {
+    'joined': joinedload,
+    'selectin': selectinload,
+    'subquery': subqueryload,
+    'lazy': lazyload
+}
+
+# Helper functions
+
+def poster_loader():
+    strategy = current_app.config.get('TASKS_POSTER_LOADING', 'joined')
+    try:
+        return POSTER_LOADERS[strategy](Task.poster)
+    except KeyError:
+        raise ValueError('Unknown poster loading strategy: {}'.format(strategy))
+
+def dashboard_tasks(status):
+    return db.session.query(Task).options(poster_loader()).filter_by(status = status).order_by(Task.due_date.asc())
+
+def open_tasks():
+    return dashboard_tasks('1')
+
+def closed_tasks():
+    return dashboard_tasks('0')
+
+# Scopes a single task to the rows the user may modify, so the permission
+# check happens in the same statement as the write
+def modifiable_task(task_id, user_id, is_admin):
+    query = db.session.query(Task).filter(Task.task_id == task_id)
+    if not is_admin:
+        query = query.filter(Task.user_id == user_id)
+    return query
+
+def change_result(rowcount, task_id):
+    if rowcount:
+        return 'changed'
+    if db.session.query(Task.task_id).filter(Task.task_id == task_id).first() is None:
+        return 'not_found'
+    return 'forbidden'
+
+def complete_task(task_id, user_id, is_admin):
+    rowcount = modifiable_task(task_id, user_id, is_admin).update({'status': 0}, synchronize_session = False)
+    return change_result(rowcount, task_id)
+
+def delete_task(task_id, user_id, is_admin):
+    rowcount = modifiable_task(task_id, user_id, is_admin).delete(synchronize_session = False)
+    return change_result(rowcount, task_id)
+
+# The tasks table version is bumped inside every write transaction and backs
+# the ETag/Last-Modified validators, so a revalidation never reads a task row.
+# Cached pages and dashboard tables are keyed on it too: the counter lives in
+# the database, so a write in one worker makes the old entries unreachable in
+# every worker, whatever the cache backend.
+def touch_tasks():
+    now = datetime.datetime.utcnow()
+    db.session.execute(TableVersion.bump(db.session.get_bind().dialect.name, 'tasks', now))
+
+# Single tasks are cached under their own key with the version they were read
+# at, so a hit needs no query and a write only evicts the tasks it changed.
+# Writers delete the keys after committing; only a backend shared by the
+# workers (file) lets the other workers see that.
+def task_key(task_id):
+    return 'task:{}'.format(task_id)
+
+def forget_tasks(task_ids):
+    cache.delete(*[task_key(task_id) for task_id in task_ids])
+
+def tasks_version():
+    row = db.session.query(TableVersion.version, TableVersion.updated_at).filter_by(name = 'tasks').first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
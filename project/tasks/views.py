@@ -2,13 +2,20 @@
 # project/tasks/views.py
 
 import datetime
+import hashlib
+import time
 from functools import wraps
-from flask import Flask, flash, redirect, render_template, request, session, url_for, Blueprint
+from flask import Flask, current_app, flash, make_response, redirect, render_template, request, session, url_for, Blueprint
+from markupsafe import Markup
 from sqlalchemy.exc import IntegrityError
 
 from .forms import AddTaskForm
-from project import db
+from project import db, cache
 from project.models import Task
+from .queries import poster_loader, open_tasks, closed_tasks, complete_task, delete_task, forget_tasks, tasks_version, touch_tasks
+from project.conditional import add_validators, not_modified
+from project.database import read_only
+from project.search import search_tasks
 
 # Config
 
@@ -26,11 +33,65 @@ def login_required(test):
             return redirect(url_for('users.login'))
     return wrap
 
-def open_tasks():
-    return db.session.query(Task).filter_by(status = '1').order_by(Task.due_date.asc())
+def paginate(query, page_arg):
+    page = max(request.args.get(page_arg, 1, type = int), 1)
+    return query.paginate(page, current_app.config['DASHBOARD_PAGE_SIZE'], False)
 
-def closed_tasks():
-    return db.session.query(Task).filter_by(status = '0').order_by(Task.due_date.asc())
+# A table only differs between viewers in its Complete/Delete buttons, which
+# admins get on every row and other users on the rows they posted
+def permission_class(posters):
+    if session.get('role') == 'admin':
+        return 'admin'
+    if session.get('name') in posters:
+        return 'owner:{}'.format(session.get('name'))
+    return 'other'
+
+# Rendered tables are cached per tasks table version, which every task write
+# bumps in the database, so a hit skips both the queries and the template and
+# no worker serves a table from before another worker's write
+def render_section(section, query, page_arg):
+    template, name = '_{}_tasks.html'.format(section), '{}_tasks'.format(section)
+    if not current_app.config['DASHBOARD_FRAGMENT_CACHING']:
+        return Markup(render_template(template, **{name: paginate(query(), page_arg)}))
+    key = 'fragment:{}:{}:{}:{}:{}'.format(section, tasks_version()[0], current_app.config['DASHBOARD_PAGE_SIZE'],
+        request.args.get('open_page'), request.args.get('closed_page'))
+    posters = cache.get(key + ':posters')
+    if posters is not None:
+        html = cache.get('{}:{}'.format(key, permission_class(posters)))
+        if html is not None:
+            return Markup(html)
+    tasks = paginate(query(), page_arg)
+    posters = sorted(set(task.poster.name for task in tasks.items if task.poster))
+    html = render_template(template, **{name: tasks})
+    cache.set(key + ':posters', posters)
+    cache.set('{}:{}'.format(key, permission_class(posters)), html)
+    return Markup(html)
+
+# Closed tasks are only rendered up front when their page is requested,
+# otherwise the dashboard loads them on demand from tasks.closed
+def render_dashboard(form, error = None):
+    closed = None
+    if 'closed_page' in request.args:
+        closed = render_section('closed', closed_tasks, 'closed_page')
+    return render_template('tasks.html',
+        form = form,
+        error = error,
+        open_table = render_section('open', open_tasks, 'open_page'),
+        closed_table = closed
+        )
+
+# The dashboard depends on the tasks table, the viewer, the page state and the
+# CSRF token embedded in the form, which is rotated before it can expire.
+# Pages carrying flashed messages are never revalidated.
+def dashboard_etag():
+    csrf_token = session.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+    if '_flashes' in session or (current_app.config.get('WTF_CSRF_ENABLED', True) and csrf_token is None):
+        return None
+    version, last_modified = tasks_version()
+    csrf_window = max(current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600, 2) // 2
+    parts = [version, session['user_id'], session['role'], session['name'], request.query_string, csrf_token,
+        int(time.time()) // csrf_window]
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
 
 # Add a new task
 def new_task():
@@ -47,35 +108,59 @@ def new_task():
                 session['user_id']
                 )
             db.session.add(new_task)
+            touch_tasks()
             db.session.commit()
             flash('New task created!', 'success')
             return redirect(url_for('tasks.tasks'))
-    return render_template('tasks.html', form = form, error = error, open_tasks = open_tasks(), closed_tasks = closed_tasks())
+    return render_dashboard(form, error)
 
 # Routes
 
 # Show tasks
 @tasks_blueprint.route('/tasks/', methods = ['GET', 'POST'])
 @login_required
+@read_only
 def tasks():
     if request.method == 'POST':
         return new_task()
-    return render_template('tasks.html',
-        form = AddTaskForm(request.form),
-        open_tasks = open_tasks(),
-        closed_tasks = closed_tasks()
-        )
+    etag = dashboard_etag()
+    if etag:
+        response = not_modified(etag)
+        if response:
+            return response
+        return add_validators(make_response(render_dashboard(AddTaskForm(request.form))), etag)
+    return render_dashboard(AddTaskForm(request.form))
+
+# Closed tasks fragment
+@tasks_blueprint.route('/tasks/closed/')
+@login_required
+@read_only
+def closed():
+    return render_section('closed', closed_tasks, 'closed_page')
+
+# Search tasks by name
+@tasks_blueprint.route('/tasks/search/')
+@login_required
+@read_only
+def search():
+    q = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type = int), 1)
+    results, has_next = search_tasks(q, page, current_app.config['DASHBOARD_PAGE_SIZE'], poster_loader())
+    return render_template('search.html', q = q, page = page, results = results, has_next = has_next)
 
 # Complete a task
 @tasks_blueprint.route('/complete/<int:task_id>/')
 @login_required
 def complete(task_id):
-    task_to_complete_id = task_id
-    task = db.session.query(Task).filter_by(task_id = task_to_complete_id)
-    if session['role'] == 'admin' or session['user_id'] == task.first().user_id:
-        task.update({'status' : '0'})
-        db.session.commit()
+    result = complete_task(task_id, session['user_id'], session['role'] == 'admin')
+    if result == 'changed':
+        touch_tasks()
+    db.session.commit()
+    if result == 'changed':
+        forget_tasks([task_id])
         flash('Task is complete. Good job!', 'success')
+    elif result == 'not_found':
+        flash('Task does not exist.')
     else:
         flash('You can only update yours tasks.')
     return redirect(url_for('tasks.tasks'))
@@ -84,12 +169,15 @@ def complete(task_id):
 @tasks_blueprint.route('/delete/<int:task_id>/')
 @login_required
 def delete(task_id):
-    task_to_delete_id = task_id
-    task = db.session.query(Task).filter_by(task_id = task_to_delete_id)
-    if session['role'] == 'admin' or session['user_id'] == task.first().user_id:
-        task.delete()
-        db.session.commit()
-        flash('Task deleted!', 'success')    
+    result = delete_task(task_id, session['user_id'], session['role'] == 'admin')
+    if result == 'changed':
+        touch_tasks()
+    db.session.commit()
+    if result == 'changed':
+        forget_tasks([task_id])
+        flash('Task deleted!', 'success')
+    elif result == 'not_found':
+        flash('Task does not exist.')
     else:
         flash('You can only delete yours tasks.')
     return redirect(url_for('tasks.tasks'))
\ No newline at end of file
@@ -0,0 +1,109 @@
+
+# project/users/passwords.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+# Exceptions
+
+class HasherBusy(Exception):
+    pass
+
+# Pool
+
+# The hashing threads and admission slots of one app, rebuilt in each process
+# so a hasher set up before gunicorn forks still works in every worker
+class HashPool(object):
+
+    def __init__(self, workers, admitted):
+        self.executor = ThreadPoolExecutor(max_workers = min(workers, admitted))
+        self.slots = threading.BoundedSemaphore(admitted)
+        self.pid = os.getpid()
+
+# Extension
+
+# bcrypt releases the GIL while hashing, so a small pool bounds how many
+# hashes run at once. The request thread still waits for its hash, so only a
+# PASSWORD_HASH_THREAD_SHARE of the worker's REQUEST_THREADS may be in a
+# password check at a time; anyone beyond that is turned away after
+# PASSWORD_HASH_TIMEOUT and the other threads stay free for other requests.
+# Settings and the pool belong to the current app (app.extensions['passwords']);
+# outside an app context the hasher uses the app it was built with, or the
+# last one set up.
+class PasswordHasher(object):
+
+    def __init__(self, bcrypt = None, app = None):
+        self.bcrypt = bcrypt
+        self.app = app
+        self._default = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, bcrypt = None):
+        if bcrypt is not None:
+            self.bcrypt = bcrypt
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('REQUEST_THREADS', 8)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 4)
+        app.config.setdefault('PASSWORD_HASH_THREAD_SHARE', 0.5)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 0.05)
+        app.extensions.pop('passwords', None)
+        self._default = app
+
+    def get_app(self):
+        if has_app_context():
+            return current_app._get_current_object()
+        return self.app or self._default
+
+    @property
+    def config(self):
+        return self.get_app().config
+
+    @property
+    def admitted(self):
+        return max(1, int(self.config['REQUEST_THREADS'] * self.config['PASSWORD_HASH_THREAD_SHARE']))
+
+    def _pool(self):
+        app = self.get_app()
+        pool = app.extensions.get('passwords')
+        if pool is None or pool.pid != os.getpid():
+            with self._lock:
+                pool = app.extensions.get('passwords')
+                if pool is None or pool.pid != os.getpid():
+                    pool = app.extensions['passwords'] = HashPool(self.config['PASSWORD_HASH_WORKERS'], self.admitted)
+        return pool
+
+    def _run(self, function, *args):
+        pool = self._pool()
+        if not pool.slots.acquire(timeout = self.config['PASSWORD_HASH_TIMEOUT']):
+            raise HasherBusy()
+        try:
+            future = pool.executor.submit(function, *args)
+        except Exception:
+            pool.slots.release()
+            raise
+        future.add_done_callback(lambda future: pool.slots.release())
+        return future.result()
+
+    @property
+    def rounds(self):
+        return self.config['BCRYPT_LOG_ROUNDS']
+
+    def generate(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        return self._run(self.bcrypt.check_password_hash, pw_hash, password)
+
+    # bcrypt hashes look like $2b$<rounds>$<salt and digest>
+    def needs_rehash(self, pw_hash):
+        if isinstance(pw_hash, bytes):
+            pw_hash = pw_hash.decode('utf-8')
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
@@ -6,8 +6,9 @@ from flask import Flask, flash, redirect, render_template, request, session, url
 from sqlalchemy.exc import IntegrityError
 
 from .forms import RegisterForm, LoginForm
-from project import db, bcrypt
+from project import db, passwords
 from project.models import User
+from .passwords import HasherBusy
 from pprint import pprint
 
 # Config
@@ -41,8 +42,7 @@ def guest(test):
 @users_blueprint.route('/logout/')
 @login_required
 def logout():
-    user = User.query.filter_by(user_id = session['user_id']).first()
-    flash('Goodbye {}...'.format(user.name), 'info')
+    flash('Goodbye {}...'.format(session['name']), 'info')
     session.pop('logged_in', None)
     session.pop('user_id', None)
     session.pop('role', None)
@@ -58,7 +58,16 @@ def login():
     if request.method == 'POST':
         if form.validate_on_submit():
             user = User.query.filter_by(name = request.form['name']).first()
-            if user is not None and bcrypt.check_password_hash(user.password, request.form['password']):
+            try:
+                valid = user is not None and passwords.check(user.password, request.form['password'])
+                if valid and passwords.needs_rehash(user.password):
+                    user.password = passwords.generate(request.form['password'])
+                    db.session.commit()
+            except HasherBusy:
+                return render_template('login.html', form = form, error = 'Too many logins in progress. Please try again.'), 503
+            if valid:
+                if hasattr(session, 'regenerate'):
+                    session.regenerate()
                 session['logged_in'] = True
                 session['user_id'] = user.user_id
                 session['role'] = user.role
@@ -77,10 +86,14 @@ def register():
     form = RegisterForm(request.form)
     if request.method == 'POST':
         if form.validate_on_submit():
+            try:
+                password = passwords.generate(form.password.data)
+            except HasherBusy:
+                return render_template('register.html', form = form, error = 'Too many registrations in progress. Please try again.'), 503
             new_user = User(
                 form.name.data,
                 form.email.data,
-                bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+                password
                 )
             try:
                 db.session.add(new_user)
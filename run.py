@@ -2,7 +2,9 @@
 # run.py
 
 import os
-from project import app
+from project import create_app
+
+app = create_app()
 
 port = int(os.environ.get('PORT', 5000))
 app.run(host = '0.0.0.0', port = port)
\ No newline at end of file
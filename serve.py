@@ -0,0 +1,161 @@
+# serve.py
+#
+# Usage: python serve.py [start] [--worker-class sync|gthread|gevent|asgi] [--workers N] [--threads N]
+#        python serve.py reload [--pidfile PATH]
+#
+# Runs the app under gunicorn. Every option can also be set from the
+# environment (WEB_WORKER_CLASS, WEB_CONCURRENCY, WEB_THREADS, PORT, ...).
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+
+# Config
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'asgi': 'uvicorn.workers.UvicornWorker'
+}
+
+# Helper functions
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+# Blocking workers need spare processes to cover requests waiting on the
+# database; threaded and evented workers get their concurrency from threads
+# and the event loop instead, so they stay close to one process per core
+def default_workers(worker_class, cpus):
+    if worker_class == 'sync':
+        return cpus * 2 + 1
+    if worker_class == 'gthread':
+        return cpus + 1
+    return cpus
+
+# Writes evict cached tasks only from the backend they can reach, so several
+# workers need the cache shared through CACHE_DIR
+def default_cache_type(workers):
+    return 'file' if workers > 1 else 'lru'
+
+# asgi workers run the Flask routes on a thread pool of the same size
+def default_threads(worker_class, cpus):
+    if worker_class in ('gthread', 'asgi'):
+        return min(cpus * 2, 8) if cpus > 1 else 4
+    return 1
+
+def parse_args(argv = None, environ = os.environ):
+    parser = argparse.ArgumentParser(description = 'Run FlaskTaskr under gunicorn')
+    parser.add_argument('command', nargs = '?', choices = ['start', 'reload'], default = 'start')
+    parser.add_argument('--worker-class', choices = sorted(WORKER_CLASSES), default = environ.get('WEB_WORKER_CLASS', 'gthread'))
+    parser.add_argument('--workers', type = int, default = environ.get('WEB_CONCURRENCY'))
+    parser.add_argument('--threads', type = int, default = environ.get('WEB_THREADS'))
+    parser.add_argument('--bind', default = environ.get('WEB_BIND', '0.0.0.0:{}'.format(environ.get('PORT', 5000))))
+    parser.add_argument('--no-preload', dest = 'preload', action = 'store_false', default = environ.get('WEB_PRELOAD', '1') != '0')
+    parser.add_argument('--max-requests', type = int, default = environ.get('WEB_MAX_REQUESTS', 1000))
+    parser.add_argument('--max-requests-jitter', type = int, default = environ.get('WEB_MAX_REQUESTS_JITTER', 100))
+    parser.add_argument('--timeout', type = int, default = environ.get('WEB_TIMEOUT', 30))
+    parser.add_argument('--graceful-timeout', type = int, default = environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+    parser.add_argument('--pidfile', default = environ.get('WEB_PIDFILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.pid')))
+    return parser.parse_args(argv)
+
+def gunicorn_options(args, cpus = None):
+    cpus = cpus or cpu_count()
+    return {
+        'bind': args.bind,
+        'worker_class': WORKER_CLASSES[args.worker_class],
+        'workers': args.workers or default_workers(args.worker_class, cpus),
+        'threads': args.threads or default_threads(args.worker_class, cpus),
+        'preload_app': args.preload,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'pidfile': args.pidfile,
+        'post_fork': post_fork
+    }
+
+# Connections opened by the master while preloading must not be shared
+# between workers, so each worker starts with empty pools. Without preload
+# the app is only loaded after the fork and there is nothing to dispose.
+def post_fork(server, worker):
+    if server.app.flask_app is None:
+        return
+    from project import db
+    with server.app.flask_app.app_context():
+        db.engine.dispose()
+    for replica_set in list(db._replicas.values()):
+        for engine in replica_set.engines:
+            engine.dispose()
+
+def read_pid(pidfile):
+    with open(pidfile) as f:
+        return int(f.read().strip())
+
+# HUP makes gunicorn replace its workers gracefully, but with preload_app the
+# code lives in the master, so a new master is started with USR2 and the old
+# one is stopped with TERM, which lets its workers finish their requests. The
+# new master writes <pidfile>.2 and takes over the pidfile once the old exits.
+def reload(pidfile, preload, timeout = 60):
+    pid = read_pid(pidfile)
+    if not preload:
+        os.kill(pid, signal.SIGHUP)
+        return pid
+    os.kill(pid, signal.SIGUSR2)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            new_pid = read_pid(pidfile + '.2')
+        except (IOError, OSError, ValueError):
+            new_pid = None
+        if new_pid and new_pid != pid:
+            os.kill(pid, signal.SIGTERM)
+            return new_pid
+        time.sleep(0.5)
+    raise RuntimeError('New master did not start within {} seconds'.format(timeout))
+
+# Launcher
+
+class Launcher(BaseApplication):
+
+    def __init__(self, worker_class, options):
+        self.worker_class = worker_class
+        self.options = options
+        self.flask_app = None
+        super(Launcher, self).__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if self.worker_class == 'asgi':
+            from project.asgi import application
+            self.flask_app = application.flask_app
+            return application
+        from project import create_app
+        self.flask_app = create_app()
+        return self.flask_app
+
+def main(argv = None):
+    args = parse_args(argv)
+    if args.command == 'reload':
+        print('Reloaded, master pid {}'.format(reload(args.pidfile, args.preload)))
+        return
+    options = gunicorn_options(args)
+    # sizes the app's per-worker limits, such as the password hashing slots
+    os.environ['WEB_THREADS'] = str(options['threads'])
+    os.environ.setdefault('CACHE_TYPE', default_cache_type(options['workers']))
+    Launcher(args.worker_class, options).run()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
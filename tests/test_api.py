@@ -2,12 +2,26 @@
 # tests/test_tasks.py
 
 import os
+import json
+import base64
+import resource
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
-from project import app, db, bcrypt
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from project import app, db, bcrypt, cache
 from project._config import basedir
-from project.models import User, Task
-from datetime import date
+from project.api import bulk
+from project.api.fields import msgpack
+from project.cache import FileCache
+from project.models import User, Task, TaskCount, TableVersion
+from project.tasks.queries import task_key, touch_tasks
+from db_migrate import rebuild_stats
+from datetime import date, datetime, timedelta
 
 TEST_DB = 'test.db'
 
@@ -23,6 +37,7 @@ class TasksTests(unittest.TestCase):
 
         self.app = app.test_client()
         db.create_all()
+        cache.clear()
 
     def tearDown(self):
         db.session.remove()
@@ -55,6 +70,69 @@ class TasksTests(unittest.TestCase):
         )
         db.session.commit()
 
+    def add_many_tasks(self, count):
+        for i in range(count):
+            db.session.add(Task('Task {}'.format(i), date(2018, 1, 1 + i % 3), 1, date(2018, 1, 1), 1, 1))
+        db.session.commit()
+
+    def bulk_insert_tasks(self, count, batch = 10000):
+        for offset in range(0, count, batch):
+            db.session.execute(Task.__table__.insert(), [{
+                'name': 'Task {}'.format(i),
+                'due_date': date(2018, 1, 1),
+                'priority': 1,
+                'posted_date': date(2018, 1, 1),
+                'status': i % 2,
+                'user_id': 1
+                } for i in range(offset, min(offset + batch, count))])
+        db.session.commit()
+
+    def query_plan(self, url):
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT') and 'FROM tasks' in statement:
+                statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.app.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(response.status_code, 200)
+        statement, parameters = statements[-1]
+        connection = db.engine.raw_connection()
+        try:
+            rows = connection.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        finally:
+            connection.close()
+        return ' '.join(row[-1] for row in rows)
+
+    def create_user(self, name = 'johndoe', email = 'johndoe@example.com', password = 'mypassword', role = 'user'):
+        new_user = User(name, email, bcrypt.generate_password_hash(password), role)
+        db.session.add(new_user)
+        db.session.commit()
+        return new_user
+
+    def login(self, name, password = 'mypassword'):
+        return self.app.post('/', data = dict(
+            name = name,
+            password = password
+            ),
+        follow_redirects = True
+        )
+
+    def set_tasks_updated_at(self, updated_at):
+        touch_tasks()
+        db.session.query(TableVersion).filter_by(name = 'tasks').update({'updated_at': updated_at})
+        db.session.commit()
+
+    def post_json(self, url, payload):
+        response = self.app.post(url, data = json.dumps(payload), content_type = 'application/json')
+        return response, json.loads(response.data.decode('utf-8'))
+
+    def get_json(self, url):
+        response = self.app.get(url)
+        return response, json.loads(response.data.decode('utf-8'))
+
     # Tests
 
     def test_collection_endpoint_returns_correct_data(self):
@@ -80,5 +158,453 @@ class TasksTests(unittest.TestCase):
         self.assertEquals(response.mimetype, 'application/json')
         self.assertIn(b'Element does not exist', response.data)
 
+    def test_collection_endpoint_walks_pages_with_cursors(self):
+        self.add_many_tasks(25)
+        seen = []
+        response, data = self.get_json('api/v1/tasks/?limit=10')
+        self.assertIsNone(data['prev'])
+        pages = [data]
+        while data['next']:
+            response, data = self.get_json('api/v1/tasks/?limit=10&cursor=' + data['next'])
+            pages.append(data)
+        for page in pages:
+            seen.extend(item['task_id'] for item in page['items'])
+        self.assertEqual([len(page['items']) for page in pages], [10, 10, 5])
+        self.assertEqual(sorted(seen), list(range(1, 26)))
+        keys = [(item['due date'], item['task_id']) for page in pages for item in page['items']]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_collection_endpoint_prev_cursor_returns_previous_page(self):
+        self.add_many_tasks(25)
+        response, first = self.get_json('api/v1/tasks/?limit=10')
+        response, second = self.get_json('api/v1/tasks/?limit=10&cursor=' + first['next'])
+        response, back = self.get_json('api/v1/tasks/?limit=10&cursor=' + second['prev'])
+        self.assertEqual(back['items'], first['items'])
+        self.assertIsNone(back['prev'])
+
+    def test_collection_endpoint_caps_page_size(self):
+        self.add_many_tasks(5)
+        app.config['API_MAX_PAGE_SIZE'] = 3
+        try:
+            response, data = self.get_json('api/v1/tasks/?limit=1000')
+        finally:
+            app.config['API_MAX_PAGE_SIZE'] = 100
+        self.assertEqual(len(data['items']), 3)
+        self.assertIsNotNone(data['next'])
+
+    def test_collection_endpoint_rejects_invalid_cursor(self):
+        response, data = self.get_json('api/v1/tasks/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['error'], 'Invalid cursor')
+        for payload in [{'a': 1, 'b': 2, 'c': 3}, 'abc', 42]:
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+            response, data = self.get_json('api/v1/tasks/?cursor=' + cursor)
+            self.assertEqual(response.status_code, 400, payload)
+            self.assertEqual(data['error'], 'Invalid cursor')
+
+    def test_export_endpoint_streams_ndjson(self):
+        self.add_tasks()
+        response = self.app.get('api/v1/tasks/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual([row['task name'] for row in rows], ['First Task', 'Second Task'])
+
+    def test_export_endpoint_applies_filters(self):
+        self.add_tasks()
+        db.session.add(Task('Closed Task', date(2018, 1, 5), 10, date(2018, 1, 5), 0, 2))
+        db.session.commit()
+        response = self.app.get('api/v1/tasks/export?status=1&user_id=1&due_from=2018-01-05&due_to=2018-01-31')
+        rows = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual([row['task name'] for row in rows], ['Second Task'])
+
+    def test_export_endpoint_rejects_invalid_filters(self):
+        response, data = self.get_json('api/v1/tasks/export?due_from=yesterday')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['error'], 'Invalid date for due_from')
+
+    def test_export_endpoint_memory_stays_flat_on_large_tables(self):
+        self.bulk_insert_tasks(500000)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # memory mapped database pages would show up in the resident set size
+        with mock.patch.dict(app.config['SQLITE_PRAGMAS'], mmap_size = 0):
+            response = self.app.get('api/v1/tasks/export', buffered = False)
+            rows = 0
+            for chunk in response.response:
+                rows += 1
+            response.close()
+        # ru_maxrss is reported in kilobytes
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        self.assertEqual(rows, 500000)
+        self.assertLess(growth, 32 * 1024)
+
+    def test_bulk_create_inserts_valid_tasks_and_reports_invalid_ones(self):
+        user = self.create_user()
+        self.login(user.name)
+        response, data = self.post_json('api/v1/tasks/bulk/create', {'tasks': [
+            {'name': 'Bulk one', 'due_date': '2018-02-01', 'priority': 3},
+            {'name': '', 'due_date': '2018-02-01', 'priority': 3},
+            {'name': 'Bulk two', 'due_date': '2018-02-02', 'priority': 11}
+            ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'invalid', 'invalid'])
+        tasks = db.session.query(Task).all()
+        self.assertEqual([(task.name, task.user_id, task.status) for task in tasks], [('Bulk one', user.user_id, 1)])
+        self.assertEqual(data['results'][0], {'index': 0, 'status': 'created', 'task_id': tasks[0].task_id})
+
+    def test_bulk_endpoints_chunk_inserts_and_id_lists(self):
+        user = self.create_user()
+        self.login(user.name)
+        with mock.patch.object(bulk, 'INSERT_CHUNK_SIZE', 3), mock.patch.object(bulk, 'ID_CHUNK_SIZE', 4):
+            response, data = self.post_json('api/v1/tasks/bulk/create', {'tasks': [
+                {'name': 'Bulk {}'.format(i), 'due_date': '2018-02-01', 'priority': 1} for i in range(10)
+                ]})
+            names = dict(db.session.query(Task.task_id, Task.name).all())
+            self.assertEqual([names[result['task_id']] for result in data['results']],
+                ['Bulk {}'.format(i) for i in range(10)])
+            ids = [result['task_id'] for result in data['results']]
+            response, data = self.post_json('api/v1/tasks/bulk/complete', {'ids': ids + [99]})
+        self.assertEqual([result['status'] for result in data['results']], ['completed'] * 10 + ['not_found'])
+        self.assertEqual(db.session.query(Task).filter_by(status = 0).count(), 10)
+
+    def test_bulk_complete_reports_per_item_results(self):
+        self.create_user()
+        other_user = self.create_user(name = 'janedoe', email = 'jane@example.com')
+        db.session.add(Task('Mine', date(2018, 1, 1), 1, date(2018, 1, 1), 1, 1))
+        db.session.add(Task('Theirs', date(2018, 1, 1), 1, date(2018, 1, 1), 1, other_user.user_id))
+        db.session.commit()
+        self.login('johndoe')
+        response, data = self.post_json('api/v1/tasks/bulk/complete', {'ids': [1, 2, 99]})
+        self.assertEqual(data['results'], [
+            {'task_id': 1, 'status': 'completed'},
+            {'task_id': 2, 'status': 'forbidden'},
+            {'task_id': 99, 'status': 'not_found'}
+            ])
+        statuses = dict(db.session.query(Task.task_id, Task.status).all())
+        self.assertEqual(statuses, {1: 0, 2: 1})
+
+    def test_bulk_delete_lets_admins_delete_any_task(self):
+        self.create_user()
+        self.create_user(name = 'janedoe', email = 'jane@example.com', role = 'admin')
+        self.add_tasks()
+        self.login('janedoe')
+        response, data = self.post_json('api/v1/tasks/bulk/delete', {'ids': [1, 2]})
+        self.assertEqual([result['status'] for result in data['results']], ['deleted', 'deleted'])
+        self.assertEqual(db.session.query(Task).count(), 0)
+
+    def test_bulk_endpoints_require_login(self):
+        response, data = self.post_json('api/v1/tasks/bulk/delete', {'ids': [1]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_endpoints_reject_malformed_payloads(self):
+        user = self.create_user()
+        self.login(user.name)
+        response, data = self.post_json('api/v1/tasks/bulk/complete', {'ids': ['1']})
+        self.assertEqual(response.status_code, 400)
+        response, data = self.post_json('api/v1/tasks/bulk/create', [])
+        self.assertEqual(response.status_code, 400)
+
+    def test_resource_endpoint_is_served_from_cache(self):
+        self.add_tasks()
+        self.app.get('api/v1/tasks/2')
+        hits = cache.hits
+        db.session.query(Task).filter_by(task_id = 2).update({'name': 'Changed behind the cache'})
+        db.session.commit()
+        response = self.app.get('api/v1/tasks/2')
+        self.assertIn(b'Second Task', response.data)
+        self.assertEqual(cache.hits, hits + 1)
+
+    def test_writes_invalidate_cached_tasks_and_pages(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_tasks()
+        self.app.get('api/v1/tasks/1')
+        self.app.get('api/v1/tasks/')
+        self.app.get('/complete/1/')
+        response, data = self.get_json('api/v1/tasks/1')
+        self.assertEqual(data['status'], 0)
+        response, data = self.get_json('api/v1/tasks/')
+        self.assertEqual([item['status'] for item in data['items']], [0, 1])
+        self.app.get('/delete/2/')
+        response = self.app.get('api/v1/tasks/2')
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_writes_invalidate_cached_tasks(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_tasks()
+        self.app.get('api/v1/tasks/1')
+        self.post_json('api/v1/tasks/bulk/complete', {'ids': [1]})
+        response, data = self.get_json('api/v1/tasks/1')
+        self.assertEqual(data['status'], 0)
+
+    def test_cache_stats_endpoint_exposes_counters(self):
+        self.add_tasks()
+        self.app.get('api/v1/tasks/1')
+        self.app.get('api/v1/tasks/1')
+        response, data = self.get_json('api/v1/cache/stats')
+        self.assertEqual(data['backend'], 'LRUCache')
+        self.assertGreaterEqual(data['hits'], 1)
+        self.assertGreaterEqual(data['misses'], 1)
+
+    def test_resource_endpoint_returns_not_modified_for_matching_etag(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.post_json('api/v1/tasks/bulk/create', {'tasks': [
+            {'name': 'First Task', 'due_date': '2018-01-01', 'priority': 1},
+            {'name': 'Second Task', 'due_date': '2018-01-10', 'priority': 1}
+            ]})
+        self.set_tasks_updated_at(datetime(2018, 1, 1, 12, 0, 0, 500000))
+        response = self.app.get('api/v1/tasks/2')
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        self.assertEqual(last_modified, 'Mon, 01 Jan 2018 12:00:01 GMT')
+        response = self.app.get('api/v1/tasks/2', headers = {'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.app.get('api/v1/tasks/2', headers = {'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_after_last_modified_is_modified_since(self):
+        self.add_tasks()
+        self.set_tasks_updated_at(datetime(2018, 1, 1, 12, 0, 0, 200000))
+        last_modified = self.app.get('api/v1/tasks/2').headers.get('Last-Modified')
+        self.set_tasks_updated_at(datetime(2018, 1, 1, 12, 0, 1, 300000))
+        cache.delete(task_key(2))
+        response = self.app.get('api/v1/tasks/2', headers = {'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+
+    # a second write in the same second could not be told apart by date
+    def test_last_modified_is_withheld_until_the_write_second_is_over(self):
+        self.add_tasks()
+        self.set_tasks_updated_at(datetime.utcnow() + timedelta(seconds = 1))
+        response = self.app.get('api/v1/tasks/2')
+        self.assertIsNone(response.headers.get('Last-Modified'))
+        self.assertIsNotNone(response.headers.get('ETag'))
+
+    def test_version_bump_creates_and_increments_the_row_in_one_statement(self):
+        self.assertIsNone(db.session.query(TableVersion).get('tasks'))
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            touch_tasks()
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('ON CONFLICT', statements[0])
+        touch_tasks()
+        db.session.commit()
+        self.assertEqual(db.session.query(TableVersion).get('tasks').version, 2)
+        statement = TableVersion.bump('postgresql', 'tasks', datetime.utcnow())
+        self.assertIn('ON CONFLICT (name) DO UPDATE', str(statement.compile(dialect = postgresql.dialect())))
+
+    def test_cached_entries_follow_writes_made_by_other_workers(self):
+        directory = tempfile.mkdtemp()
+        backend, cache.backend = cache.backend, FileCache(directory)
+        try:
+            self.add_tasks()
+            self.assertIn(b'Second Task', self.app.get('api/v1/tasks/2').data)
+            self.assertIn(b'Second Task', self.app.get('api/v1/tasks/').data)
+            # another worker's write bumps the shared version and evicts the
+            # task from the cache directory both workers use
+            db.session.query(Task).filter_by(task_id = 2).update({'name': 'Changed elsewhere'})
+            touch_tasks()
+            db.session.commit()
+            FileCache(directory).delete(task_key(2))
+            self.assertIn(b'Changed elsewhere', self.app.get('api/v1/tasks/2').data)
+            self.assertIn(b'Changed elsewhere', self.app.get('api/v1/tasks/').data)
+        finally:
+            cache.backend = backend
+            shutil.rmtree(directory)
+
+    def test_cached_task_is_revalidated_without_queries(self):
+        self.add_tasks()
+        etag = self.app.get('api/v1/tasks/2').headers.get('ETag')
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.assertEqual(self.app.get('api/v1/tasks/2').status_code, 200)
+            self.assertEqual(self.app.get('api/v1/tasks/2', headers = {'If-None-Match': etag}).status_code, 304)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(statements, [])
+
+    def test_collection_etag_changes_after_writes(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_tasks()
+        etag = self.app.get('api/v1/tasks/').headers.get('ETag')
+        self.assertEqual(self.app.get('api/v1/tasks/', headers = {'If-None-Match': etag}).status_code, 304)
+        self.post_json('api/v1/tasks/bulk/complete', {'ids': [1]})
+        response = self.app.get('api/v1/tasks/', headers = {'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats_endpoint_follows_task_writes(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.app.post('/tasks/', data = dict(name = 'Overdue', due_date = '01/01/2018', priority = '1'))
+        self.app.post('/tasks/', data = dict(name = 'Later', due_date = '01/01/2099', priority = '2'))
+        self.app.post('/tasks/', data = dict(name = 'Done', due_date = '01/01/2018', priority = '2'))
+        self.app.get('/complete/3/')
+        response, data = self.get_json('api/v1/stats?user_id=1')
+        self.assertEqual((data['open'], data['closed'], data['overdue']), (2, 1, 1))
+        self.assertEqual(data['priorities']['2'], {'open': 1, 'closed': 1})
+        self.app.get('/delete/1/')
+        response, data = self.get_json('api/v1/stats')
+        self.assertEqual((data['open'], data['closed'], data['overdue']), (1, 1, 0))
+
+    def test_stats_endpoint_does_not_scan_tasks(self):
+        self.bulk_insert_tasks(1000)
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response, data = self.get_json('api/v1/stats?user_id=1')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual((data['open'], data['closed']), (500, 500))
+        self.assertFalse([statement for statement in statements if 'FROM tasks' in statement])
+
+    def test_stats_rebuild_reconciles_drifted_counters(self):
+        self.bulk_insert_tasks(10)
+        db.session.query(TaskCount).update({'count': 42})
+        db.session.commit()
+        rebuild_stats(db.engine)
+        response, data = self.get_json('api/v1/stats')
+        self.assertEqual((data['open'], data['closed'], data['overdue']), (5, 5, 5))
+
+    def test_search_endpoint_ranks_matching_tasks(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.post_json('api/v1/tasks/bulk/create', {'tasks': [
+            {'name': 'Buy oat milk and bread', 'due_date': '2018-01-01', 'priority': 1},
+            {'name': 'Write report', 'due_date': '2018-01-01', 'priority': 1},
+            {'name': 'Milk, more milk', 'due_date': '2018-01-01', 'priority': 1}
+            ]})
+        response, data = self.get_json('api/v1/tasks/search?q=milk')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['task name'] for item in data['items']], ['Milk, more milk', 'Buy oat milk and bread'])
+        response, data = self.get_json('api/v1/tasks/search?q=rep')
+        self.assertEqual([item['task name'] for item in data['items']], ['Write report'])
+
+    def test_search_endpoint_paginates_results(self):
+        self.bulk_insert_tasks(25)
+        response, data = self.get_json('api/v1/tasks/search?q=task&limit=10')
+        self.assertEqual((len(data['items']), data['next'], data['prev']), (10, 2, None))
+        response, data = self.get_json('api/v1/tasks/search?q=task&limit=10&page=3')
+        self.assertEqual((len(data['items']), data['next'], data['prev']), (5, None, 2))
+
+    def test_search_index_follows_updates_and_deletes(self):
+        self.add_tasks()
+        db.session.query(Task).filter_by(task_id = 1).update({'name': 'Renamed'})
+        db.session.query(Task).filter_by(task_id = 2).delete()
+        db.session.commit()
+        self.assertEqual(self.get_json('api/v1/tasks/search?q=task')[1]['items'], [])
+        response, data = self.get_json('api/v1/tasks/search?q=renamed')
+        self.assertEqual([item['task_id'] for item in data['items']], [1])
+
+    def test_search_endpoint_uses_the_full_text_index(self):
+        self.bulk_insert_tasks(100)
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.get_json('api/v1/tasks/search?q=task%2042')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertTrue(any('MATCH' in statement for statement in statements))
+        self.assertFalse(any('LIKE' in statement for statement in statements))
+
+    def test_search_endpoint_rejects_missing_query(self):
+        response, data = self.get_json('api/v1/tasks/search?q=%20')
+        self.assertEqual(response.status_code, 400)
+        response = self.app.get('api/v1/tasks/search?q=a&page=x')
+        self.assertEqual(response.status_code, 400)
+
+    def test_collection_endpoint_filters_and_sorts(self):
+        self.bulk_insert_tasks(30)
+        db.session.query(Task).filter(Task.task_id > 20).update({'priority': 5, 'due_date': date(2018, 2, 1)})
+        db.session.commit()
+        response, data = self.get_json('api/v1/tasks/?status=1&due_from=2018-01-15')
+        self.assertEqual([item['task_id'] for item in data['items']], [22, 24, 26, 28, 30])
+        response, data = self.get_json('api/v1/tasks/?priority_min=2&sort=-priority&limit=6')
+        self.assertEqual([item['task_id'] for item in data['items']], [30, 29, 28, 27, 26, 25])
+        response, data = self.get_json('api/v1/tasks/?priority_min=2&sort=-priority&limit=6&cursor=' + data['next'])
+        self.assertEqual([item['task_id'] for item in data['items']], [24, 23, 22, 21])
+        self.assertIsNone(data['next'])
+
+    def test_collection_endpoint_uses_the_expected_index(self):
+        self.bulk_insert_tasks(1000)
+        expected = {
+            'api/v1/tasks/': 'ix_tasks_due_date_task_id',
+            'api/v1/tasks/?status=1&due_to=2018-06-01': 'ix_tasks_status_due_date_task_id',
+            'api/v1/tasks/?user_id=1&status=0': 'ix_tasks_user_id_status_due_date',
+            'api/v1/tasks/?user_id=1&sort=-due_date': 'ix_tasks_user_id_due_date',
+            'api/v1/tasks/?posted_from=2018-01-01&sort=posted_date': 'ix_tasks_posted_date_task_id',
+            'api/v1/tasks/?priority_min=1&priority_max=3&sort=priority': 'ix_tasks_priority_task_id'
+            }
+        for url, index in expected.items():
+            plan = self.query_plan(url)
+            self.assertIn('INDEX ' + index, plan, url)
+            self.assertNotIn('TEMP B-TREE', plan, url)
+
+    def test_collection_endpoint_rejects_unindexed_requests(self):
+        for url in ['api/v1/tasks/?status=1&priority_min=3', 'api/v1/tasks/?user_id=1&sort=priority',
+                'api/v1/tasks/?sort=name', 'api/v1/tasks/?status=open']:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 400, url)
+
+    def test_collection_cursor_is_bound_to_its_sort(self):
+        self.bulk_insert_tasks(20)
+        response, data = self.get_json('api/v1/tasks/?limit=5&sort=priority')
+        response = self.app.get('api/v1/tasks/?limit=5&sort=due_date&cursor=' + data['next'])
+        self.assertEqual(response.status_code, 400)
+
+    def test_collection_endpoint_selects_only_requested_fields(self):
+        self.add_tasks()
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response, data = self.get_json('api/v1/tasks/?fields=task_id,name,status')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(data['items'][0], {'task_id': 1, 'task name': 'First Task', 'status': 1})
+        select = [statement for statement in statements if 'FROM tasks' in statement][0]
+        self.assertNotIn('tasks.priority', select)
+        self.assertNotIn('tasks.posted_date', select)
+        response, data = self.get_json('api/v1/tasks/2?fields=name')
+        self.assertEqual(data, {'task name': 'Second Task'})
+
+    def test_tasks_endpoints_reject_unknown_fields(self):
+        self.add_tasks()
+        self.assertEqual(self.app.get('api/v1/tasks/?fields=name,password').status_code, 400)
+        self.assertEqual(self.app.get('api/v1/tasks/1?fields=secret').status_code, 400)
+        self.assertEqual(self.app.get('api/v1/tasks/?format=xml').status_code, 400)
+
+    def test_collection_endpoint_columnar_format(self):
+        self.add_many_tasks(3)
+        response, data = self.get_json('api/v1/tasks/?fields=task_id,due_date&format=columnar')
+        self.assertEqual(data['fields'], ['task_id', 'due date'])
+        self.assertEqual(data['columns'], [[1, 2, 3], ['2018-01-01', '2018-01-02', '2018-01-03']])
+        self.assertNotIn('items', data)
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_collection_endpoint_negotiates_msgpack(self):
+        self.add_tasks()
+        response = self.app.get('api/v1/tasks/?fields=task_id', headers = {'Accept': 'application/msgpack'})
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        self.assertIn('Accept', response.headers.get('Vary'))
+        self.assertEqual(msgpack.unpackb(response.data, raw = False)['items'], [{'task_id': 1}, {'task_id': 2}])
+        response = self.app.get('api/v1/tasks/?fields=task_id')
+        self.assertEqual(response.mimetype, 'application/json')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+# tests/test_asgi.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+import unittest
+from datetime import date
+
+from flask import Flask
+
+from project import app, db, cache
+from project._config import basedir
+from project.models import Task
+
+try:
+    from project.asgi import Application, aiosqlite
+except ImportError:
+    Application = aiosqlite = None
+
+TEST_DB = 'test.db'
+
+@unittest.skipIf(Application is None or aiosqlite is None, 'asgiref and aiosqlite are not installed')
+class AsgiTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['DEBUG'] = False
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, TEST_DB)
+        db.create_all()
+        cache.clear()
+        db.session.add(Task('First Task', date(2018, 1, 1), 10, date(2018, 1, 1), 1, 1))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    # Helper functions
+
+    async def call(self, application, path, query_string = b'', headers = ()):
+        messages = []
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def send(message):
+            messages.append(message)
+        await application({
+            'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'scheme': 'http',
+            'query_string': query_string, 'headers': list(headers), 'http_version': '1.1',
+            'server': ('localhost', 80)
+            }, receive, send)
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return messages[0]['status'], dict(messages[0]['headers']), body
+
+    def request(self, path, query_string = b'', headers = ()):
+        application = Application(app)
+        async def run():
+            try:
+                return await self.call(application, path, query_string, headers)
+            finally:
+                if application.database is not None:
+                    await application.database.close()
+        return asyncio.run(run())
+
+    # Tests
+
+    def test_task_endpoint_matches_the_wsgi_response(self):
+        status, headers, body = self.request('/api/v1/tasks/1')
+        expected = app.test_client().get('/api/v1/tasks/1')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode('utf-8')), json.loads(expected.data.decode('utf-8')))
+        self.assertEqual(headers[b'etag'].decode('latin-1'), expected.headers['ETag'])
+        status, headers, body = self.request('/api/v1/tasks/2')
+        self.assertEqual(status, 404)
+        self.assertIn(b'Element does not exist', body)
+
+    def test_task_endpoint_supports_fields_and_validators(self):
+        status, headers, body = self.request('/api/v1/tasks/1', b'fields=name')
+        self.assertEqual(json.loads(body.decode('utf-8')), {'task name': 'First Task'})
+        status, headers, body = self.request('/api/v1/tasks/1', b'fields=name', [(b'if-none-match', headers[b'etag'])])
+        self.assertEqual((status, body), (304, b''))
+        status, headers, body = self.request('/api/v1/tasks/1', b'fields=secret')
+        self.assertEqual(status, 400)
+
+    def test_other_routes_fall_back_to_the_wsgi_app(self):
+        status, headers, body = self.request('/api/v1/tasks/')
+        self.assertEqual(status, 200)
+        self.assertIn(b'First Task', body)
+        status, headers, body = self.request('/')
+        self.assertEqual(status, 200)
+        self.assertIn(b'Please log in', body)
+
+    def test_wsgi_routes_run_concurrently(self):
+        slow_app = Flask(__name__)
+        slow_app.config.update(SQLALCHEMY_DATABASE_URI = 'sqlite://', DATABASE_POOL_SIZE = 1, SQLITE_PRAGMAS = {},
+            REQUEST_THREADS = 2)
+        @slow_app.route('/slow')
+        def slow():
+            time.sleep(0.5)
+            return threading.current_thread().name
+        application = Application(slow_app)
+        async def run():
+            return await asyncio.gather(self.call(application, '/slow'), self.call(application, '/slow'))
+        started = time.perf_counter()
+        responses = asyncio.run(run())
+        self.assertLess(time.perf_counter() - started, 0.9)
+        self.assertEqual([status for status, headers, body in responses], [200, 200])
+        self.assertEqual(len(set(body for status, headers, body in responses)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
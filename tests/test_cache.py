@@ -0,0 +1,74 @@
+
+# tests/test_cache.py
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from project.cache import Cache, FileCache, LRUCache
+
+class CacheTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # Helper functions
+
+    def backends(self):
+        return [LRUCache(threshold = 3), FileCache(self.directory, threshold = 3, prune_interval = 1)]
+
+    # Tests
+
+    def test_backends_store_and_delete_values(self):
+        for backend in self.backends():
+            backend.set('key', {'value': 1}, 0)
+            self.assertEqual(backend.get('key')[1], {'value': 1})
+            backend.delete('key')
+            self.assertIsNone(backend.get('key'))
+
+    def test_backends_expire_entries(self):
+        for backend in self.backends():
+            backend.set('key', 'value', 0.01)
+            time.sleep(0.02)
+            self.assertIsNone(backend.get('key'))
+
+    def test_backends_evict_least_recently_used_entries(self):
+        for backend in self.backends():
+            for key in ('a', 'b', 'c'):
+                backend.set(key, key, 0)
+                time.sleep(0.01)
+            backend.get('a')
+            backend.set('d', 'd', 0)
+            self.assertEqual(len(backend), 3)
+            self.assertIsNone(backend.get('b'))
+            self.assertIsNotNone(backend.get('a'))
+
+    def test_file_cache_prunes_every_interval_sets(self):
+        backend = FileCache(self.directory, threshold = 3, prune_interval = 5)
+        with mock.patch('project.cache.os.listdir', wraps = os.listdir) as listdir:
+            for key in 'abcd':
+                backend.set(key, key, 0)
+            self.assertEqual(listdir.call_count, 0)
+            backend.set('e', 'e', 0)
+            self.assertEqual(listdir.call_count, 1)
+        self.assertEqual(len(backend), 3)
+
+    def test_get_or_set_counts_hits_and_misses(self):
+        cache = Cache()
+        cache.backend = LRUCache()
+        calls = []
+        for _ in range(3):
+            cache.get_or_set('key', lambda: calls.append(1) or 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+
+# tests/test_database.py
+
+import os
+import json
+import unittest
+from datetime import date
+
+from flask import g
+from sqlalchemy import create_engine
+
+from project import app, db, bcrypt, cache
+from project._config import basedir
+from project.models import User, Task
+
+TEST_DB = 'test.db'
+REPLICA_DB = 'test_replica.db'
+
+class DatabaseTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['DEBUG'] = False
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, TEST_DB)
+        app.config['SQLALCHEMY_REPLICA_URIS'] = ['sqlite:///' + os.path.join(basedir, REPLICA_DB)]
+
+        self.app = app.test_client()
+        db.create_all()
+        self.replica = create_engine(app.config['SQLALCHEMY_REPLICA_URIS'][0])
+        db.Model.metadata.create_all(self.replica)
+        cache.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.Model.metadata.drop_all(self.replica)
+        self.replica.dispose()
+        os.remove(os.path.join(basedir, REPLICA_DB))
+        app.config['SQLALCHEMY_REPLICA_URIS'] = []
+        app.config['DATABASE_REPLICA_SELECTION'] = 'round_robin'
+
+    # Helper functions
+
+    def login(self, name, password = 'mypassword'):
+        return self.app.post('/', data = dict(
+            name = name,
+            password = password
+            ),
+        follow_redirects = True
+        )
+
+    def create_user(self, name = 'johndoe', email = 'johndoe@example.com', password = 'mypassword', role = 'user'):
+        new_user = User(name, email, bcrypt.generate_password_hash(password), role)
+        db.session.add(new_user)
+        db.session.commit()
+        return new_user
+
+    def add_task(self, name, engine = None):
+        row = dict(name = name, due_date = date(2018, 1, 1), priority = 1, posted_date = date(2018, 1, 1), status = 1, user_id = 1)
+        with (engine or db.engine).begin() as connection:
+            connection.execute(Task.__table__.insert(), row)
+
+    def task_name(self, task_id):
+        response = self.app.get('/api/v1/tasks/{}'.format(task_id))
+        return json.loads(response.data.decode('utf-8')).get('task name')
+
+    # Tests
+
+    def test_read_only_views_read_from_the_replica(self):
+        self.add_task('Primary task')
+        self.add_task('Replica task', self.replica)
+        self.assertEqual(self.task_name(1), 'Replica task')
+
+    def test_writes_go_to_the_primary_and_stick_for_the_next_reads(self):
+        self.create_user()
+        self.add_task('Primary task')
+        self.add_task('Replica task', self.replica)
+        self.login('johndoe')
+        response = self.app.post('/tasks/', data = dict(name = 'Fresh task', due_date = '01/01/2018', priority = '1'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(db.session.query(Task).filter_by(name = 'Fresh task').count(), 1)
+        with self.replica.connect() as connection:
+            self.assertEqual(connection.execute("SELECT count(*) FROM tasks WHERE name = 'Fresh task'").scalar(), 0)
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Fresh task', response.data)
+        self.assertEqual(self.task_name(1), 'Primary task')
+
+    def test_views_that_are_not_read_only_use_the_primary(self):
+        self.create_user()
+        response = self.login('johndoe')
+        self.assertIn(b'Welcome, johndoe!', response.data)
+
+    def test_least_loaded_selection_picks_an_idle_replica(self):
+        app.config['DATABASE_REPLICA_SELECTION'] = 'least_loaded'
+        self.add_task('Replica task', self.replica)
+        self.assertEqual(self.task_name(1), 'Replica task')
+
+    def test_a_request_reads_from_a_single_replica(self):
+        app.config['SQLALCHEMY_REPLICA_URIS'] = app.config['SQLALCHEMY_REPLICA_URIS'] + ['sqlite://']
+        chosen = []
+        for _ in range(2):
+            with app.test_request_context('/api/v1/tasks/'):
+                g.database_read_only = True
+                engines = set(db.session.get_bind(Task.__mapper__) for _ in range(3))
+            self.assertEqual(len(engines), 1)
+            chosen.append(engines.pop())
+        self.assertNotEqual(chosen[0], chosen[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+
+# tests/test_logs.py
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from project.logs import BufferedLogWriter
+
+class LogsTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'error.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # Helper functions
+
+    def read(self, path = None):
+        with open(path or self.path) as f:
+            return f.read()
+
+    # Tests
+
+    def test_writer_appends_queued_lines(self):
+        writer = BufferedLogWriter(self.path)
+        for i in range(100):
+            writer.enqueue('\nline {}'.format(i))
+        writer.flush()
+        writer.close()
+        self.assertEqual(self.read(), ''.join('\nline {}'.format(i) for i in range(100)))
+        self.assertEqual(writer.written, 100)
+
+    def test_writer_drops_and_counts_lines_when_queue_is_full(self):
+        writer = BufferedLogWriter(self.path, queue_size = 2, batch_size = 1)
+        release = threading.Event()
+        write = writer._write
+        def slow_write(data):
+            release.wait()
+            write(data)
+        writer._write = slow_write
+        for i in range(10):
+            writer.enqueue('\nline {}'.format(i))
+        release.set()
+        writer.flush()
+        writer.close()
+        self.assertGreater(writer.dropped, 0)
+        self.assertEqual(writer.written + writer.dropped, 10)
+
+    def test_writer_rotates_by_size(self):
+        writer = BufferedLogWriter(self.path, max_bytes = 100, backup_count = 2, batch_size = 1)
+        for i in range(30):
+            writer.enqueue('\n' + 'x' * 19)
+            writer.flush()
+        writer.close()
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertLessEqual(os.path.getsize(self.path), 100)
+
+    def test_writer_reopens_file_rotated_by_another_process(self):
+        writer = BufferedLogWriter(self.path)
+        writer.enqueue('\nfirst')
+        writer.flush()
+        os.rename(self.path, self.path + '.1')
+        writer.enqueue('\nsecond')
+        writer.flush()
+        writer.close()
+        self.assertEqual(self.read(), '\nsecond')
+        self.assertEqual(self.read(self.path + '.1'), '\nfirst')
+
+if __name__ == '__main__':
+    unittest.main()
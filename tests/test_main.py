@@ -4,9 +4,12 @@
 import os
 import unittest
 
-from project import app, db
+from project import app, db, bcrypt, metrics, error_log
 from project._config import basedir
-from project.models import User
+from project.models import User, Task
+from db_migrate import create_indexes
+from sqlalchemy.engine.url import make_url
+from datetime import date
 
 TEST_DB = 'test.db'
 
@@ -44,6 +47,14 @@ class MainTests(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertIn(b'Sorry. There\'s nothing here.', response.data)
 
+    def test_404_error_is_logged(self):
+        self.app.get('/this-route-is-logged/')
+        error_log.flush()
+        with open(error_log.writer.path) as f:
+            last_record = f.read().split('\n')[-1]
+        self.assertTrue(last_record.startswith('404 error at '))
+        self.assertTrue(last_record.endswith(': http://localhost/this-route-is-logged/'))
+
     def test_500_error(self):
         bad_user = User(
             name = 'johndoe', 
@@ -59,5 +70,59 @@ class MainTests(unittest.TestCase):
         except ValueError:
             pass
 
+    def test_create_indexes_builds_missing_indexes_in_place(self):
+        db.session.add(Task('Existing task', date(2018, 1, 1), 1, date(2018, 1, 1), 1, 1))
+        db.session.commit()
+        for index in Task.__table__.indexes:
+            db.engine.execute('DROP INDEX {}'.format(index.name))
+        create_indexes()
+        create_indexes()
+        names = [row[0] for row in db.engine.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        self.assertIn('ix_tasks_status_due_date_task_id', names)
+        self.assertIn('ix_tasks_user_id_status_due_date', names)
+        self.assertEqual(db.session.query(Task).count(), 1)
+
+    def test_create_indexes_replaces_retired_index_definitions(self):
+        db.engine.execute('DROP INDEX ix_tasks_user_id_status_due_date')
+        db.engine.execute('CREATE INDEX ix_tasks_user_id_status ON tasks (user_id, status)')
+        create_indexes()
+        names = [row[0] for row in db.engine.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        self.assertNotIn('ix_tasks_user_id_status', names)
+        columns = [row[2] for row in db.engine.execute('PRAGMA index_info(ix_tasks_user_id_status_due_date)')]
+        self.assertEqual(columns, ['user_id', 'status', 'due_date', 'task_id'])
+
+    def test_metrics_endpoint_reports_request_sql_and_template_histograms(self):
+        db.session.add(User('johndoe', 'johndoe@example.com', bcrypt.generate_password_hash('mypassword')))
+        db.session.commit()
+        self.login('johndoe')
+        self.app.get('/tasks/')
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        body = response.data.decode('utf-8')
+        self.assertIn('# TYPE flasktaskr_request_duration_seconds histogram', body)
+        self.assertIn('flasktaskr_request_duration_seconds_count{endpoint="tasks.tasks"}', body)
+        self.assertIn('flasktaskr_sql_queries_bucket{endpoint="users.login",le="+Inf"}', body)
+        self.assertIn('flasktaskr_template_render_seconds_sum{endpoint="tasks.tasks"}', body)
+
+    def test_metrics_count_sql_queries_per_request(self):
+        family = metrics.families['queries']
+        before = family.histograms['api.task'].sum if 'api.task' in family.histograms else 0
+        self.app.get('/api/v1/tasks/4242')
+        self.assertGreaterEqual(family.histograms['api.task'].sum - before, 2)
+
+    def test_sqlite_connections_use_the_tuned_pragmas(self):
+        with db.engine.connect() as connection:
+            self.assertEqual(connection.execute('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(connection.execute('PRAGMA synchronous').scalar(), 1)
+            self.assertEqual(connection.execute('PRAGMA busy_timeout').scalar(), 5000)
+
+    def test_server_databases_get_a_pre_pinged_pool(self):
+        options = {}
+        db.apply_driver_hacks(app, make_url('postgresql://taskr@localhost/taskr'), options)
+        self.assertEqual(options['pool_size'], app.config['DATABASE_POOL_SIZE'])
+        self.assertEqual(options['max_overflow'], app.config['DATABASE_MAX_OVERFLOW'])
+        self.assertTrue(options['pool_pre_ping'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+# tests/test_seed.py
+
+import os
+import random
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import create_engine, inspect
+
+import db_seed
+from project import app, db
+from project._config import basedir
+from project.models import Task, User
+
+class SeedTests(unittest.TestCase):
+
+    # Config
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix = '.db')
+        os.close(handle)
+        self.engine = create_engine('sqlite:///' + self.path)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    # Helper functions
+
+    def scalar(self, statement):
+        with self.engine.connect() as connection:
+            return connection.exec_driver_sql(statement).scalar()
+
+    # Tests
+
+    def test_generated_tasks_are_repeatable_and_realistic(self):
+        today = date(2020, 6, 1)
+        first = list(db_seed.generate_tasks(random.Random(1), 2000, [1, 2, 3, 4], today))
+        self.assertEqual(first, list(db_seed.generate_tasks(random.Random(1), 2000, [1, 2, 3, 4], today)))
+        self.assertTrue(all(1 <= task[2] <= 10 and task[1] >= task[3] for task in first))
+        self.assertTrue(all(task[3] <= today.isoformat() for task in first))
+        owners = [task[5] for task in first]
+        self.assertGreater(owners.count(1), owners.count(4))
+        overdue = [task[4] for task in first if task[1] < '2020-05-01']
+        self.assertGreater(overdue.count(0), overdue.count(1))
+
+    def test_seed_loads_users_and_tasks(self):
+        user_ids = db_seed.seed(self.engine, users = 5, tasks = 500, rounds = 4)
+        self.assertEqual(user_ids, [1, 2, 3, 4, 5])
+        self.assertEqual(self.scalar('SELECT count(*) FROM users'), 5)
+        self.assertEqual(self.scalar('SELECT count(*) FROM tasks'), 500)
+        self.assertEqual(self.scalar("SELECT version FROM table_versions WHERE name = 'tasks'"), 1)
+        db_seed.seed(self.engine, users = 2, tasks = 10, rounds = 4)
+        self.assertEqual(self.scalar('SELECT max(user_id) FROM users'), 7)
+
+    def test_seed_rebuilds_indexes_counters_and_search(self):
+        db_seed.seed(self.engine, users = 5, tasks = 500, rounds = 4)
+        indexes = [index['name'] for index in inspect(self.engine).get_indexes('tasks')]
+        self.assertEqual(sorted(indexes), sorted(index.name for index in Task.__table__.indexes))
+        self.assertEqual(self.scalar('SELECT sum(count) FROM task_counts WHERE user_id = 0'), 500)
+        self.assertEqual(self.scalar("SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'report'"),
+            self.scalar("SELECT count(*) FROM tasks WHERE name LIKE '%report%'"))
+
+    def test_triggers_are_back_after_the_load(self):
+        db_seed.seed(self.engine, users = 1, tasks = 10, rounds = 4)
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO tasks (name, due_date, priority, posted_date, status, user_id) "
+                "VALUES ('Walk the dog', '2020-01-01', 1, '2020-01-01', 1, 1)")
+        self.assertEqual(self.scalar('SELECT sum(count) FROM task_counts WHERE user_id = 0'), 11)
+        self.assertEqual(self.scalar("SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'dog'"), 1)
+
+    def test_postgres_user_sequence_is_moved_past_the_seeded_ids(self):
+        connection = mock.Mock()
+        connection.dialect.name = 'postgresql'
+        db_seed.reset_sequences(connection)
+        statement = str(connection.execute.call_args[0][0])
+        self.assertIn("setval(pg_get_serial_sequence('users', 'user_id')", statement)
+        connection.dialect.name = 'sqlite'
+        connection.execute.reset_mock()
+        db_seed.reset_sequences(connection)
+        connection.execute.assert_not_called()
+
+    def test_users_can_register_after_seeding(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'test.db')
+        db.create_all()
+        try:
+            db_seed.seed(db.engine, users = 3, tasks = 10, rounds = 4)
+            response = app.test_client().post('/register/', data = dict(
+                name = 'newcomer', email = 'newcomer@example.com', password = 'mypassword', confirm = 'mypassword'
+                ), follow_redirects = True)
+            self.assertIn(b'Registration completed', response.data)
+            self.assertEqual(db.session.query(User.user_id).filter_by(name = 'newcomer').scalar(), 4)
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# tests/test_serializers.py
+
+import json
+import unittest
+from datetime import date
+from unittest import mock
+
+from project import serializers
+from project.serializers import task_schema, user_schema
+
+class SerializerTests(unittest.TestCase):
+
+    # Tests
+
+    def test_task_schema_serializes_core_rows_by_position(self):
+        row = (1, 'First Task', date(2018, 1, 1), 10, date(2018, 1, 2), 1, 3)
+        self.assertEqual(task_schema.dump([row]), [{
+            'task_id': 1,
+            'task name': 'First Task',
+            'due date': '2018-01-01',
+            'priority': 10,
+            'posted date': '2018-01-02',
+            'status': 1,
+            'user id': 3
+            }])
+
+    def test_serializer_picks_fields_out_of_a_wider_select(self):
+        selected = task_schema.names(['name'], 'due_date', 'task_id')
+        self.assertEqual(selected, ['task_id', 'name', 'due_date'])
+        self.assertEqual(task_schema.dump([(7, 'Seven', None)], ['name'], selected), [{'task name': 'Seven'}])
+
+    def test_serializers_are_compiled_once_per_field_set(self):
+        first = task_schema.serializer(['task_id', 'status'])
+        self.assertIs(task_schema.serializer(['task_id', 'status']), first)
+        self.assertIsNot(task_schema.serializer(['task_id']), first)
+
+    def test_user_schema_leaves_out_the_password(self):
+        self.assertEqual(user_schema.dump([(1, 'johndoe', 'john@example.com', 'admin')]),
+            [{'user_id': 1, 'name': 'johndoe', 'email': 'john@example.com', 'role': 'admin'}])
+
+    def test_dumps_falls_back_to_the_standard_library(self):
+        with mock.patch.object(serializers, 'orjson', None):
+            self.assertEqual(json.loads(serializers.dumps({'a': [1, 'b']}).decode('utf-8')), {'a': [1, 'b']})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# tests/test_serve.py
+
+import os
+import signal
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy.engine import Engine
+
+try:
+    import serve
+except ImportError:
+    serve = None
+
+@unittest.skipIf(serve is None, 'gunicorn is not installed')
+class ServeTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        handle, self.pidfile = tempfile.mkstemp(suffix = '.pid')
+        os.close(handle)
+
+    def tearDown(self):
+        for path in (self.pidfile, self.pidfile + '.2'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Helper functions
+
+    def write_pid(self, pid, suffix = ''):
+        with open(self.pidfile + suffix, 'w') as f:
+            f.write('{}\n'.format(pid))
+
+    # Tests
+
+    def test_worker_counts_are_derived_from_the_cpu_count(self):
+        options = serve.gunicorn_options(serve.parse_args([], {}), cpus = 4)
+        self.assertEqual((options['worker_class'], options['workers'], options['threads']), ('gthread', 5, 8))
+        options = serve.gunicorn_options(serve.parse_args(['--worker-class', 'sync'], {}), cpus = 4)
+        self.assertEqual((options['workers'], options['threads']), (9, 1))
+        options = serve.gunicorn_options(serve.parse_args(['--worker-class', 'asgi'], {}), cpus = 4)
+        self.assertEqual((options['worker_class'], options['workers'], options['threads']),
+            ('uvicorn.workers.UvicornWorker', 4, 8))
+
+    def test_environment_overrides_the_defaults(self):
+        args = serve.parse_args([], {'WEB_CONCURRENCY': '3', 'WEB_THREADS': '2', 'PORT': '8080', 'WEB_PRELOAD': '0'})
+        options = serve.gunicorn_options(args, cpus = 16)
+        self.assertEqual((options['workers'], options['threads'], options['bind']), (3, 2, '0.0.0.0:8080'))
+        self.assertFalse(options['preload_app'])
+
+    def test_several_workers_share_the_file_cache(self):
+        self.assertEqual(serve.default_cache_type(1), 'lru')
+        self.assertEqual(serve.default_cache_type(5), 'file')
+
+    def test_preload_and_recycling_are_on_by_default(self):
+        options = serve.gunicorn_options(serve.parse_args([], {}), cpus = 1)
+        self.assertTrue(options['preload_app'])
+        self.assertEqual((options['max_requests'], options['max_requests_jitter']), (1000, 100))
+
+    def test_reload_sends_hup_without_preload(self):
+        self.write_pid(1234)
+        with mock.patch.object(os, 'kill') as kill:
+            serve.reload(self.pidfile, preload = False)
+        kill.assert_called_once_with(1234, signal.SIGHUP)
+
+    def test_reload_starts_a_new_master_with_preload(self):
+        self.write_pid(1234)
+        def kill(pid, signum):
+            if signum == signal.SIGUSR2:
+                self.write_pid(5678, '.2')
+        with mock.patch.object(os, 'kill', side_effect = kill) as mocked:
+            self.assertEqual(serve.reload(self.pidfile, preload = True), 5678)
+        self.assertEqual(mocked.call_args_list, [mock.call(1234, signal.SIGUSR2), mock.call(1234, signal.SIGTERM)])
+
+    def test_post_fork_without_preload_has_nothing_to_dispose(self):
+        server = mock.Mock()
+        server.app.flask_app = None
+        with mock.patch.object(Engine, 'dispose') as dispose:
+            serve.post_fork(server, mock.Mock())
+        dispose.assert_not_called()
+
+    def test_post_fork_disposes_the_primary_and_replica_engines(self):
+        from project import app, db
+        app.config['SQLALCHEMY_REPLICA_URIS'] = ['sqlite://']
+        try:
+            with app.app_context():
+                replica = db.replica_engine()
+                primary = db.engine
+            server = mock.Mock()
+            server.app.flask_app = app
+            with mock.patch.object(Engine, 'dispose', autospec = True) as dispose:
+                serve.post_fork(server, mock.Mock())
+        finally:
+            app.config['SQLALCHEMY_REPLICA_URIS'] = []
+        disposed = [call[0][0] for call in dispose.call_args_list]
+        self.assertIn(primary, disposed)
+        self.assertIn(replica, disposed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+
+# tests/test_sessions.py
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from project import app, db, bcrypt
+from project._config import basedir
+from project.models import User
+from project.sessions import MemorySessionStore, SqliteSessionStore, ServerSideSessionInterface
+
+TEST_DB = 'test.db'
+
+class SessionsTests(unittest.TestCase):
+
+    # SetUp and TearDown
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['DEBUG'] = False
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, TEST_DB)
+
+        self.directory = tempfile.mkdtemp()
+        self.store = MemorySessionStore()
+        self.session_interface = app.session_interface
+        app.session_interface = ServerSideSessionInterface(self.store)
+
+        self.app = app.test_client()
+        db.create_all()
+
+    def tearDown(self):
+        app.session_interface = self.session_interface
+        shutil.rmtree(self.directory)
+        db.session.remove()
+        db.drop_all()
+
+    # Helper functions
+
+    def login(self, name, password = 'mypassword'):
+        return self.app.post('/', data = dict(
+            name = name,
+            password = password
+            ),
+        follow_redirects = True
+        )
+
+    def create_user(self, name = 'johndoe', email = 'johndoe@example.com', password = 'mypassword', role = 'user'):
+        new_user = User(name, email, bcrypt.generate_password_hash(password), role)
+        db.session.add(new_user)
+        db.session.commit()
+        return new_user
+
+    def stores(self):
+        return [MemorySessionStore(), SqliteSessionStore(os.path.join(self.directory, 'sessions.db'))]
+
+    # Tests
+
+    def test_stores_save_load_and_delete_sessions(self):
+        for store in self.stores():
+            store.save('sid', '{"name": "johndoe"}', time.time() + 60)
+            self.assertEqual(store.load('sid'), '{"name": "johndoe"}')
+            store.delete('sid')
+            self.assertIsNone(store.load('sid'))
+
+    def test_stores_expire_and_sweep_sessions(self):
+        for store in self.stores():
+            store.save('old', '{}', time.time() - 1)
+            store.save('new', '{}', time.time() + 60)
+            self.assertIsNone(store.load('old'))
+            store.sweep()
+            self.assertEqual(len(store), 1)
+
+    def test_logged_in_session_lives_in_the_store(self):
+        user = self.create_user()
+        response = self.login(user.name)
+        self.assertIn(b'Welcome, johndoe!', response.data)
+        self.assertEqual(len(self.store), 1)
+        cookie = [cookie for cookie in self.app.cookie_jar][0]
+        self.assertNotIn('johndoe', cookie.value)
+        self.assertLess(len(cookie.value), 40)
+        response = self.app.get('/tasks/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_issues_a_new_session_id(self):
+        self.create_user()
+        self.app.get('/')
+        self.app.post('/', data = dict(name = 'johndoe', password = 'wrong'))
+        before = [cookie.value for cookie in self.app.cookie_jar]
+        self.login('johndoe')
+        after = [cookie.value for cookie in self.app.cookie_jar]
+        self.assertNotEqual(before, after)
+        self.assertEqual(len(self.store), 1)
+
+    def test_logout_clears_the_stored_session_without_user_lookup(self):
+        user = self.create_user()
+        self.login(user.name)
+        db.session.query(User).delete()
+        db.session.commit()
+        response = self.app.get('/logout/', follow_redirects = True)
+        self.assertIn(b'Goodbye johndoe...', response.data)
+        response = self.app.get('/tasks/', follow_redirects = True)
+        self.assertIn(b'You need to log in first.', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
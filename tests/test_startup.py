@@ -0,0 +1,57 @@
+# tests/test_startup.py
+
+import subprocess
+import sys
+import unittest
+
+from benchmarks.bench_startup import ROOT, best_total
+
+# Modules that only the app factory may pull in
+HEAVY_MODULES = ['wtforms', 'flask_wtf', 'flask_bcrypt', 'bcrypt', 'project.users.views',
+    'project.tasks.views', 'project.api.views', 'project.models']
+
+# `import project` may cost at most this much more than importing Flask and
+# Flask-SQLAlchemy on their own. Timings are noisy, so this only catches gross
+# regressions; eager imports coming back are caught through HEAVY_MODULES.
+IMPORT_TIME_BUDGET = 1.5
+
+class StartupTests(unittest.TestCase):
+
+    # Tests
+
+    def test_importing_project_defers_heavy_modules(self):
+        output = subprocess.check_output([sys.executable, '-c',
+            'import sys, project; print(",".join(sorted(sys.modules)))'], cwd = ROOT, universal_newlines = True)
+        loaded = set(output.strip().split(','))
+        self.assertEqual([module for module in HEAVY_MODULES if module in loaded], [])
+
+    def test_project_app_is_still_importable(self):
+        output = subprocess.check_output([sys.executable, '-c',
+            'from project import app, bcrypt; print(len(app.blueprints), bcrypt.__class__.__name__)'],
+            cwd = ROOT, universal_newlines = True, stderr = subprocess.DEVNULL)
+        self.assertEqual(output.split(), ['3', 'Bcrypt'])
+
+    def test_apps_keep_their_own_extension_state(self):
+        script = '\n'.join([
+            'import os, tempfile',
+            'from project import cache, create_app, db, error_log, passwords',
+            'path = os.path.join(tempfile.mkdtemp(), "a.db")',
+            'a = create_app({"BCRYPT_LOG_ROUNDS": 4, "CACHE_TYPE": "null", "ERROR_LOG_PATH": "a.log",',
+            '    "SQLITE_PRAGMAS": {"journal_mode": "DELETE"}, "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path})',
+            'create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})',
+            'with a.app_context():',
+            '    journal = db.session.execute("PRAGMA journal_mode").scalar()',
+            '    print(passwords.rounds, cache.stats()["backend"], os.path.basename(error_log.writer.path), journal)',
+            ])
+        output = subprocess.check_output([sys.executable, '-c', script], cwd = ROOT, universal_newlines = True,
+            stderr = subprocess.DEVNULL)
+        self.assertEqual(output.split(), ['4', 'NullCache', 'a.log', 'delete'])
+
+    def test_import_time_stays_within_budget(self):
+        baseline = best_total('import flask, flask_sqlalchemy', repeat = 5)
+        total = best_total('import project', repeat = 5)
+        self.assertLessEqual(total, baseline * IMPORT_TIME_BUDGET,
+            'import project took {:.0f} ms against {:.0f} ms for its framework'.format(total / 1000.0, baseline / 1000.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,10 +3,14 @@
 
 import os
 import unittest
+from contextlib import contextmanager
 
-from project import app, db, bcrypt
+from sqlalchemy import event
+
+from project import app, db, bcrypt, cache
 from project._config import basedir
 from project.models import User, Task
+from project.tasks.queries import touch_tasks
 from datetime import date
 
 TEST_DB = 'test.db'
@@ -23,6 +27,7 @@ class TasksTests(unittest.TestCase):
 
         self.app = app.test_client()
         db.create_all()
+        cache.clear()
 
     def tearDown(self):
         db.session.remove()
@@ -68,6 +73,27 @@ class TasksTests(unittest.TestCase):
         follow_redirects = True
         )
 
+    def add_posters_and_tasks(self, count, start = 0):
+        for i in range(start, start + count):
+            poster = User('poster{}'.format(i), 'poster{}@example.com'.format(i), 'mypassword')
+            db.session.add(poster)
+            db.session.flush()
+            db.session.add(Task('Open {}'.format(i), date(2018, 1, 1), 1, date(2018, 1, 1), 1, poster.user_id))
+            db.session.add(Task('Closed {}'.format(i), date(2018, 1, 1), 1, date(2018, 1, 1), 0, poster.user_id))
+        touch_tasks()
+        db.session.commit()
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
     # Tests
     
     def test_logged_in_users_can_access_tasks_page(self):        
@@ -208,5 +234,184 @@ class TasksTests(unittest.TestCase):
         self.assertIn(b'complete/2/', response.data)
         self.assertIn(b'delete/2/', response.data)
 
+    def test_tasks_page_query_count_does_not_grow_with_tasks(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(2)
+        with self.count_queries() as few:
+            self.app.get('/tasks/')
+        self.add_posters_and_tasks(20, start = 2)
+        with self.count_queries() as many:
+            response = self.app.get('/tasks/')
+        self.assertIn(b'poster21', response.data)
+        self.assertEqual(len(few), len(many))
+
+    def test_tasks_page_supports_every_poster_loading_strategy(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(3)
+        app.config['DASHBOARD_FRAGMENT_CACHING'] = False
+        try:
+            for strategy in ('joined', 'selectin', 'subquery', 'lazy'):
+                app.config['TASKS_POSTER_LOADING'] = strategy
+                response = self.app.get('/tasks/')
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(b'poster2', response.data)
+        finally:
+            app.config['TASKS_POSTER_LOADING'] = 'joined'
+            app.config['DASHBOARD_FRAGMENT_CACHING'] = True
+
+    def test_tasks_page_paginates_open_tasks(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(30)
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Page 1 of 2', response.data)
+        self.assertIn(b'Open 24<', response.data)
+        self.assertNotIn(b'Open 25<', response.data)
+        response = self.app.get('/tasks/?open_page=2')
+        self.assertIn(b'Page 2 of 2', response.data)
+        self.assertIn(b'Open 25<', response.data)
+
+    def test_tasks_page_does_not_render_closed_tasks_up_front(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(3)
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Show closed tasks', response.data)
+        self.assertNotIn(b'Closed 0', response.data)
+
+    def test_closed_tasks_fragment_has_its_own_page_state(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(30)
+        response = self.app.get('/tasks/closed/?closed_page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'<html', response.data)
+        self.assertIn(b'Closed 25<', response.data)
+        self.assertNotIn(b'Open 25<', response.data)
+        response = self.app.get('/tasks/?open_page=2&closed_page=1')
+        self.assertIn(b'Open 25<', response.data)
+        self.assertIn(b'Closed 0<', response.data)
+        self.assertNotIn(b'Closed 25<', response.data)
+
+    def test_not_logged_in_users_cannot_access_closed_tasks_fragment(self):
+        response = self.app.get('/tasks/closed/', follow_redirects = True)
+        self.assertIn(b'You need to log in first.', response.data)
+
+    def test_users_cannot_complete_or_delete_missing_task(self):
+        user = self.create_user()
+        self.login(user.name)
+        response = self.app.get('/complete/42/', follow_redirects = True)
+        self.assertIn(b'Task does not exist.', response.data)
+        response = self.app.get('/delete/42/', follow_redirects = True)
+        self.assertIn(b'Task does not exist.', response.data)
+
+    def test_complete_runs_a_single_statement(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        with self.count_queries() as statements:
+            self.app.get('/complete/1/')
+        statements = [statement for statement in statements if 'table_versions' not in statement]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('UPDATE tasks'))
+
+    def test_delete_runs_a_single_statement(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        with self.count_queries() as statements:
+            self.app.get('/delete/1/')
+        statements = [statement for statement in statements if 'table_versions' not in statement]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('DELETE FROM tasks'))
+
+    def test_tasks_page_returns_not_modified_for_matching_etag(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        response = self.app.get('/tasks/')
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+        with self.count_queries() as statements:
+            response = self.app.get('/tasks/', headers = {'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(len(statements), 1)
+        self.assertIn('table_versions', statements[0])
+
+    def test_tasks_page_etag_changes_after_writes(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        etag = self.app.get('/tasks/').headers.get('ETag')
+        self.app.get('/complete/1/')
+        response = self.app.get('/tasks/', headers = {'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+    def test_users_can_search_tasks_from_the_dashboard(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(3)
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Search tasks', response.data)
+        response = self.app.get('/tasks/search/?q=closed')
+        self.assertIn(b'Closed 2', response.data)
+        self.assertIn(b'poster2', response.data)
+        self.assertNotIn(b'Open 2', response.data)
+        response = self.app.get('/tasks/search/?q=nothing')
+        self.assertIn(b'No tasks found.', response.data)
+
+    def test_tasks_tables_are_served_from_the_fragment_cache(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.add_posters_and_tasks(3)
+        self.app.get('/tasks/?closed_page=1')
+        with self.count_queries() as statements:
+            response = self.app.get('/tasks/?closed_page=1')
+        self.assertIn(b'Open 2<', response.data)
+        self.assertIn(b'Closed 2<', response.data)
+        self.assertFalse([statement for statement in statements if 'FROM tasks' in statement])
+
+    def test_tasks_fragment_cache_is_keyed_by_permission_class(self):
+        self.add_posters_and_tasks(2)
+        self.create_user()
+        self.create_user('admin', 'admin@example.com', role = 'admin')
+        self.login('johndoe')
+        self.assertNotIn(b'/complete/', self.app.get('/tasks/').data)
+        self.logout()
+        self.login('admin')
+        self.assertEqual(self.app.get('/tasks/').data.count(b'/complete/'), 2)
+        self.logout()
+        self.login('johndoe')
+        response = self.create_task()
+        self.assertEqual(response.data.count(b'/complete/'), 1)
+        self.assertIn(b'/complete/5/', response.data)
+
+    def test_tasks_fragment_cache_is_invalidated_by_writes(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        self.assertIn(b'/complete/1/', self.app.get('/tasks/').data)
+        self.app.get('/complete/1/')
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Welcome', response.data)
+        self.assertNotIn(b'/complete/1/', response.data)
+
+    def test_tasks_fragment_cache_follows_writes_made_by_other_workers(self):
+        user = self.create_user()
+        self.login(user.name)
+        self.create_task()
+        self.assertIn(b'New Task', self.app.get('/tasks/').data)
+        # another worker's write bumps the shared version but not this cache
+        db.session.query(Task).filter_by(task_id = 1).update({'name': 'Changed elsewhere'})
+        touch_tasks()
+        db.session.commit()
+        response = self.app.get('/tasks/')
+        self.assertIn(b'Changed elsewhere', response.data)
+        self.assertNotIn(b'New Task', response.data)
+
 if __name__ == '__main__':
     unittest.main()
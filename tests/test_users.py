@@ -2,11 +2,13 @@
 # tests/test_users.py
 
 import os
+import threading
 import unittest
 
 from project import app, db, bcrypt
 from project._config import basedir
 from project.models import User
+from project.users.passwords import HasherBusy, PasswordHasher
 
 TEST_DB = 'test.db'
 
@@ -141,5 +143,51 @@ class UsersTests(unittest.TestCase):
         for user in users:
             self.assertEqual(str(user), '<User: {}>'.format(new_user.name))
 
+    def test_login_rehashes_password_when_work_factor_changes(self):
+        db.session.add(User('johndoe', 'johndoe@example.com', bcrypt.generate_password_hash('mypassword', 4).decode('utf-8')))
+        db.session.commit()
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        try:
+            response = self.login('johndoe')
+        finally:
+            app.config['BCRYPT_LOG_ROUNDS'] = 12
+        self.assertIn(b'Welcome', response.data)
+        password = db.session.query(User.password).filter_by(name = 'johndoe').scalar()
+        self.assertTrue(password.startswith('$2b$05$'))
+        self.assertTrue(bcrypt.check_password_hash(password, 'mypassword'))
+
+    def test_password_hasher_turns_away_callers_beyond_its_limit(self):
+        started, release = threading.Event(), threading.Event()
+        class SlowBcrypt(object):
+            def check_password_hash(self, pw_hash, password):
+                started.set()
+                release.wait()
+                return True
+        class Config(object):
+            extensions = {}
+            config = {'REQUEST_THREADS': 3, 'PASSWORD_HASH_WORKERS': 4, 'PASSWORD_HASH_THREAD_SHARE': 0.5,
+                'PASSWORD_HASH_TIMEOUT': 0.01}
+        hasher = PasswordHasher(SlowBcrypt(), Config())
+        worker = threading.Thread(target = hasher.check, args = ('hash', 'password'))
+        worker.start()
+        started.wait()
+        try:
+            self.assertRaises(HasherBusy, hasher.check, 'hash', 'password')
+        finally:
+            release.set()
+            worker.join()
+        self.assertTrue(hasher.check('hash', 'password'))
+
+    def test_password_hasher_leaves_request_threads_free(self):
+        class Config(object):
+            extensions = {}
+            config = {'REQUEST_THREADS': 8, 'PASSWORD_HASH_WORKERS': 16, 'PASSWORD_HASH_THREAD_SHARE': 0.5,
+                'PASSWORD_HASH_TIMEOUT': 0.01}
+        hasher = PasswordHasher(object(), Config())
+        self.assertEqual(hasher.admitted, 4)
+        self.assertEqual(hasher._pool().executor._max_workers, 4)
+        Config.config['REQUEST_THREADS'] = 1
+        self.assertEqual(PasswordHasher(object(), Config()).admitted, 1)
+
 if __name__ == '__main__':
     unittest.main()